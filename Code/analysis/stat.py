@@ -1,13 +1,22 @@
+import glob
+import os
+
 import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 matplotlib.use('TkAgg')
 
+# Layout written by csp2/results_store.py:
+#   <root>/method=.../heuristic=.../difficulty=.../balance_param=.../part-*.npz
+RESULTS_ROOT = "../results"
+PARTITION_KEYS = ["method", "heuristic", "difficulty", "balance_param"]
+RESULT_COLUMNS = ["game", "won", "time", "guesses"]
+
 def get_stat(path, name = "na", graph_time = False, graph_win_rate = False):
     df = pd.read_csv(path, header = None, names = ["status", "time", "numberofguesses"])
 
-    df["statusflag"] = df["status"].apply(lambda x: 1 if x == "Won" else 0)
+    df["statusflag"] = (df["status"] == "Won").astype(int)
     df["time"] = df["time"].astype(float)
     df["numberofguesses"] = df["numberofguesses"].astype(int)
 
@@ -48,23 +57,72 @@ def get_stat(path, name = "na", graph_time = False, graph_win_rate = False):
 
         plt.show()
 
-def get_multi_graph(path, difficulty, name, decimal_place, start, end, step):
-    curr_path = ""
-    total_df = pd.DataFrame(columns=["alpha", "win rate"])
-
-    for i in np.arange(start, end, step):
-        alpha = round(i, decimal_place)
-        curr_path = f"{path}_{alpha}/{difficulty}/summary.csv"
-
-        df = pd.read_csv(curr_path, header=None, names=["status", "time", "numberofguesses"])
-
-        df["statusflag"] = df["status"].apply(lambda x: 1 if x == "Won" else 0)
-        win_rate = df["statusflag"].mean()
-
-        new_row = pd.DataFrame([{"alpha": i, "win rate": win_rate}])
-        total_df = pd.concat([total_df, new_row], ignore_index=True)
-
-    total_df.plot(x = "alpha", y = "win rate", kind = "scatter")
+def load_results(root = RESULTS_ROOT):
+    """Every game of every saved run under root, as one DataFrame."""
+    paths = sorted(glob.glob(os.path.join(root, *(f"{key}=*" for key in PARTITION_KEYS), "part-*.npz")))
+    columns = {name: [] for name in RESULT_COLUMNS}
+    keys = {key: [] for key in PARTITION_KEYS}
+    for path in paths:
+        with np.load(path) as part:
+            for name in RESULT_COLUMNS:
+                columns[name].append(part[name])
+        n = len(columns["won"][-1])
+        parts = os.path.relpath(os.path.dirname(path), root).split(os.sep)
+        for piece in parts:
+            key, value = piece.split("=", 1)
+            keys[key].append(np.full(n, value, dtype=object))
+
+    if not paths:
+        return pd.DataFrame(columns = PARTITION_KEYS + RESULT_COLUMNS)
+
+    df = pd.DataFrame({key: pd.Categorical(np.concatenate(keys[key])) for key in PARTITION_KEYS})
+    df["balance_param"] = df["balance_param"].astype(float)
+    for name in RESULT_COLUMNS:
+        df[name] = np.concatenate(columns[name])
+    return df
+
+def bootstrap_ci(values, n_boot = 1000, confidence = 0.95, rng = None):
+    """Percentile bootstrap confidence interval of the mean of values."""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    values = np.asarray(values, dtype=float)
+    means = values[rng.integers(0, len(values), size=(n_boot, len(values)))].mean(axis=1)
+    tail = (1 - confidence) / 2
+    return np.quantile(means, [tail, 1 - tail])
+
+def summarize(df, by = PARTITION_KEYS, n_boot = 1000, confidence = 0.95, seed = 0):
+    """
+    Win rate, time and guess statistics of every group of games in one
+    group-by, with bootstrap confidence intervals for the win rate and the
+    mean number of guesses.
+    """
+    grouped = df.groupby(by, observed = True, sort = True)
+    summary = grouped.agg(games = ("won", "size"),
+                          win_rate = ("won", "mean"),
+                          mean_time = ("time", "mean"),
+                          max_time = ("time", "max"),
+                          mean_guesses = ("guesses", "mean"),
+                          max_guesses = ("guesses", "max"))
+
+    rng = np.random.default_rng(seed)
+    won = df["won"].to_numpy()
+    guesses = df["guesses"].to_numpy()
+    by_group = {}
+    for key, idx in grouped.indices.items():
+        by_group[key] = np.concatenate([bootstrap_ci(won[idx], n_boot, confidence, rng),
+                                        bootstrap_ci(guesses[idx], n_boot, confidence, rng)])
+    intervals = np.array([by_group[key] for key in summary.index]).reshape(-1, 4)
+    summary["win_rate_lo"], summary["win_rate_hi"] = intervals[:, 0], intervals[:, 1]
+    summary["mean_guesses_lo"], summary["mean_guesses_hi"] = intervals[:, 2], intervals[:, 3]
+    return summary.reset_index()
+
+def get_multi_graph(summary, method, heuristic, difficulty, name):
+    """Win rate against balance_param, with its confidence interval, for one sweep."""
+    sweep = summary[(summary["method"] == method) & (summary["heuristic"] == heuristic)
+                    & (summary["difficulty"] == difficulty)].sort_values("balance_param")
+
+    plt.errorbar(sweep["balance_param"], sweep["win_rate"],
+                 yerr = [sweep["win_rate"] - sweep["win_rate_lo"], sweep["win_rate_hi"] - sweep["win_rate"]],
+                 fmt = "o", capsize = 3)
     plt.title(f"Alpha vs Win Rate ({name})")
     plt.xlabel("Alpha")
     plt.ylabel("Win Rate")
@@ -110,6 +168,8 @@ if __name__ == "__main__":
 
     #get_stat(path_GAC_frontier_expert)
 
-    get_multi_graph(path_GAC_relative_balanced_expert, difficulty = "expert",
-                    name = "Relative-Balanced Guess Heuristic",
-                    decimal_place = 2, start = 0.0, end = 0.45, step = 0.05)
\ No newline at end of file
+    summary = summarize(load_results())
+    print(summary.to_string(index = False))
+
+    get_multi_graph(summary, method = "GAC_mrv", heuristic = "frontier_relative_balanced", difficulty = "expert",
+                    name = "Relative-Balanced Guess Heuristic")
\ No newline at end of file
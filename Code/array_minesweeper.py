@@ -0,0 +1,157 @@
+import copy
+import random
+from collections import deque
+
+import numpy as np
+
+from Code.minesweeper import Minesweeper, LOST, REVEAL_MINE, TOGGLE_FLAG
+
+
+class ArrayMinesweeper(Minesweeper):
+    """
+    Minesweeper backed by NumPy arrays, for large boards.
+
+    The board is an int8 array holding the neighbour count of every cell,
+    with -1 for mines, and revealed/flagged are boolean arrays. Mines are
+    drawn with a single vectorized sample and the neighbour counts are sums
+    of shifted copies of the mine mask, so setting up a 1000x1000 board
+    takes no Python-level loop over cells.
+
+    probe, toggle_flag, get_cell_number, snapshot and undo behave exactly
+    like in Minesweeper; fork copies the arrays, which is cheap enough
+    that they are not shared. game.revealed[r][c] and game.flagged[r][c] still work,
+    although indexing an array one cell at a time is slower than a list.
+    """
+
+    def __init__(self, rows=9, cols=9, mines=10):
+        super().__init__(rows, cols, mines)
+        self.mines = None
+
+    def _alloc_state(self):
+        self.revealed = np.zeros((self.rows, self.cols), dtype=bool)
+        self.flagged = np.zeros((self.rows, self.cols), dtype=bool)
+
+    def _generate_board(self, excluded_r, excluded_c):
+        # Seeded from the random module, so random.seed() still fixes the board
+        rng = np.random.default_rng(random.getrandbits(64))
+        excluded = excluded_r * self.cols + excluded_c
+        positions = rng.choice(self.rows * self.cols - 1, self.total_mines, replace=False)
+        positions[positions >= excluded] += 1
+
+        mines = np.zeros(self.rows * self.cols, dtype=bool)
+        mines[positions] = True
+        self._set_mines(mines.reshape(self.rows, self.cols))
+
+    def _set_mines(self, mines):
+        mines = np.asarray(mines, dtype=bool)
+        self.mines = mines
+        padded = np.pad(mines.astype(np.int8), 1)
+        counts = np.zeros((self.rows, self.cols), dtype=np.int8)
+        for dr in (0, 1, 2):
+            for dc in (0, 1, 2):
+                if dr == 1 and dc == 1:
+                    continue
+                counts += padded[dr:dr + self.rows, dc:dc + self.cols]
+        counts[mines] = -1
+        self.board = counts
+
+    def _set_packed(self, packed):
+        bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=self.rows * self.cols,
+                             bitorder="little")
+        self._set_mines(bits.reshape(self.rows, self.cols))
+
+    def mine_mask(self):
+        return self.mines.tolist()
+
+    def flood_fill(self, r, c):
+        # Same breadth-first fill as Minesweeper, on flat views of the arrays.
+        # Neighbours are found from the row and column rather than from
+        # neighbour_table, which would cost O(rows * cols) to build on the
+        # first fill of a large board
+        rows, cols = self.rows, self.cols
+        board, revealed = self.board.reshape(-1), self.revealed.reshape(-1)
+        start = r * cols + c
+        seen = {start}
+        queue = deque([start])
+        newly = set()
+        while queue:
+            i = queue.popleft()
+            r, c = divmod(i, cols)
+            self._reveal_safe(r, c)
+            newly.add((r, c))
+            if board[i] == 0:
+                for rr in range(max(r - 1, 0), min(r + 2, rows)):
+                    for j in range(rr * cols + max(c - 1, 0), rr * cols + min(c + 2, cols)):
+                        if j not in seen:
+                            seen.add(j)
+                            if not revealed[j]:
+                                queue.append(j)
+        return newly
+
+    def probe(self, r, c):
+        if self.first_move:
+            self._generate_board(r, c)
+            self.first_move = False
+
+        if self.flagged[r, c] or self.revealed[r, c]:
+            return set()
+
+        if self.mines[r, c]:
+            self.game_over = True
+            self.journal.append((LOST, r, c))
+            hidden = self.mines & ~self.revealed
+            self.revealed |= hidden
+            self.hidden_cells -= int(hidden.sum())
+            newly = [(int(i), int(j)) for i, j in zip(*np.nonzero(hidden))]
+            self.journal.extend((REVEAL_MINE, i, j) for i, j in newly)
+            return set(newly)
+
+        if self.board[r, c] == 0:
+            return self.flood_fill(r, c)
+
+        self._reveal_safe(r, c)
+        return {(r, c)}
+
+    def get_cell_number(self, r, c):
+        if self.revealed[r, c]:
+            n = int(self.board[r, c])
+            return self.MINE if n < 0 else n
+        return None
+
+    def toggle_flag(self, r, c):
+        if not self.revealed[r, c]:
+            self.flagged[r, c] = not self.flagged[r, c]
+            self.flags_placed += 1 if self.flagged[r, c] else -1
+            self.journal.append((TOGGLE_FLAG, r, c))
+
+    def fork(self):
+        other = copy.copy(self)
+        other.revealed = self.revealed.copy()
+        other.flagged = self.flagged.copy()
+        other.journal = []
+        return other
+
+    def get_board_str(self) -> str:
+        lines = [f"Mines remaining: {self.mines_remaining()}"]
+
+        header = "    " + "".join(f"{c:>3}" for c in range(self.cols))
+        lines.append(header)
+        lines.append("    " + "—" * (3 * (self.cols + 1)))
+
+        board = self.board.tolist() if self.board is not None else None
+        revealed = self.revealed.tolist()
+        flagged = self.flagged.tolist()
+        for r in range(self.rows):
+            row_cells = []
+            for c in range(self.cols):
+                if revealed[r][c]:
+                    n = board[r][c]
+                    ch = self.MINE if n < 0 else str(n)
+                elif flagged[r][c]:
+                    ch = self.FLAG
+                else:
+                    ch = self.HIDDEN
+                row_cells.append(f"  {ch}")
+            lines.append(f"{r:>2} |" + "".join(row_cells))
+
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+import random
+
+import numpy as np
+
+from Code.minesweeper import Minesweeper
+
+
+class BatchMinesweeper:
+    """
+    n games of the same size played in lockstep, as stacked NumPy arrays.
+
+    board is an (n, rows, cols) int8 array of neighbour counts with -1 for
+    mines, and revealed/flagged are boolean arrays of the same shape.
+    probe, the flood fill and the trivial rules of deduce() (a number whose
+    flags already account for it makes its other covered neighbours safe,
+    a number needing all of its covered neighbours makes them mines) run as
+    array operations over every board at once, so a board that needs no
+    guessing is played without any per-cell Python code.
+
+    Boards where the trivial rules get stuck are not played any further
+    here: game(i) returns board i as a Minesweeper in the same state, to be
+    finished by solve_bt. Flags are only placed by deduce(), so they are
+    always right.
+    """
+
+    def __init__(self, n, rows=9, cols=9, mines=10):
+        self.n = n
+        self.rows = rows
+        self.cols = cols
+        self.total_mines = mines
+
+        self.board = None
+        self.mines = None
+        self.first_move = True
+        self.revealed = np.zeros((n, rows, cols), dtype=bool)
+        self.flagged = np.zeros((n, rows, cols), dtype=bool)
+        self.game_over = np.zeros(n, dtype=bool)
+
+    @classmethod
+    def from_mines(cls, mines):
+        """Games on fixed boards; mines[i][r][c] is True where board i has a mine."""
+        mines = np.asarray(mines, dtype=bool)
+        n, rows, cols = mines.shape
+        game = cls(n, rows, cols, int(mines[0].sum()))
+        game._set_mines(mines)
+        game.first_move = False
+        return game
+
+    def _generate_board(self, excluded_r, excluded_c):
+        # The mines of a board are the cells with the smallest random keys;
+        # the excluded cell gets a key no other cell can have.
+        # Seeded from the random module, so random.seed() still fixes the boards
+        rng = np.random.default_rng(random.getrandbits(64))
+        size = self.rows * self.cols
+        keys = rng.random((self.n, size))
+        keys[np.arange(self.n), excluded_r * self.cols + excluded_c] = 2.0
+        positions = np.argpartition(keys, self.total_mines, axis=1)[:, :self.total_mines]
+
+        mines = np.zeros((self.n, size), dtype=bool)
+        np.put_along_axis(mines, positions, True, axis=1)
+        self._set_mines(mines.reshape(self.n, self.rows, self.cols))
+
+    def _set_mines(self, mines):
+        self.mines = mines
+        counts = self._neighbours(mines)
+        counts[mines] = -1
+        self.board = counts
+
+    def _neighbours(self, mask):
+        """Number of the 8 neighbours of every cell that are set in mask."""
+        padded = np.pad(mask.astype(np.int8), ((0, 0), (1, 1), (1, 1)))
+        counts = np.zeros(mask.shape, dtype=np.int8)
+        for dr in (0, 1, 2):
+            for dc in (0, 1, 2):
+                if dr == 1 and dc == 1:
+                    continue
+                counts += padded[:, dr:dr + self.rows, dc:dc + self.cols]
+        return counts
+
+    def _dilate(self, mask):
+        """Cells that are set in mask or have a neighbour set in mask."""
+        padded = np.pad(mask, ((0, 0), (1, 1), (1, 1)))
+        grown = mask.copy()
+        for dr in (0, 1, 2):
+            for dc in (0, 1, 2):
+                grown |= padded[:, dr:dr + self.rows, dc:dc + self.cols]
+        return grown
+
+    def probe(self, r, c):
+        """Probe cell (r[i], c[i]) on every board i; r and c may also be plain ints."""
+        r = np.broadcast_to(r, self.n)
+        c = np.broadcast_to(c, self.n)
+        if self.first_move:
+            self._generate_board(r, c)
+            self.first_move = False
+
+        boards = np.arange(self.n)
+        live = ~self.game_over & ~self.flagged[boards, r, c] & ~self.revealed[boards, r, c]
+        boards, r, c = boards[live], r[live], c[live]
+        self.revealed[boards, r, c] = True
+        self.game_over[boards[self.mines[boards, r, c]]] = True
+        self._flood_fill(boards)
+
+    def _flood_fill(self, boards):
+        # A revealed 0 reveals its neighbours, one ring per pass; only the
+        # boards that grew in the last pass are looked at again
+        while boards.size:
+            revealed = self.revealed[boards]
+            grown = self._dilate(revealed & (self.board[boards] == 0)) & ~revealed
+            changed = grown.any(axis=(1, 2))
+            boards = boards[changed]
+            self.revealed[boards] |= grown[changed]
+
+    def deduce(self):
+        """
+        One pass of the trivial rules over every unfinished board: flags the
+        mines and reveals the safe cells they find. Returns the number of
+        boards that changed, so loop until it is 0.
+        """
+        boards = np.flatnonzero(self.playing())
+        if not boards.size:
+            return 0
+        board = self.board[boards]
+        revealed = self.revealed[boards]
+        flagged = self.flagged[boards]
+
+        covered = ~revealed & ~flagged
+        hidden_nb = self._neighbours(covered)
+        needed = board - self._neighbours(flagged)
+        numbers = revealed & (hidden_nb > 0)
+        safe = self._dilate(numbers & (needed == 0)) & covered
+        mine = self._dilate(numbers & (needed == hidden_nb)) & covered
+
+        changed = (safe | mine).any(axis=(1, 2))
+        self.flagged[boards] |= mine
+        self.revealed[boards] |= safe
+        self._flood_fill(boards[changed])
+        return int(changed.sum())
+
+    def won(self):
+        return ~self.game_over & ~(~self.revealed & ~self.mines).any(axis=(1, 2))
+
+    def playing(self):
+        """Boards that are neither lost nor won."""
+        return ~self.game_over & (~self.revealed & ~self.mines).any(axis=(1, 2))
+
+    def game(self, i):
+        """Board i as a Minesweeper in its current state."""
+        game = Minesweeper.from_mines(self.mines[i].tolist())
+        game.revealed = self.revealed[i].tolist()
+        game.flagged = self.flagged[i].tolist()
+        game.game_over = bool(self.game_over[i])
+        revealed = int(self.revealed[i].sum())
+        game.hidden_cells -= revealed
+        game.safe_hidden -= revealed - int((self.revealed[i] & self.mines[i]).sum())
+        game.flags_placed = int(self.flagged[i].sum())
+        return game
@@ -0,0 +1,114 @@
+import mmap
+import os
+import random
+import struct
+
+from Code.minesweeper import Minesweeper
+
+# File layout (little endian):
+#   header: magic b"MSBC", version, rows, cols, mines (uint16 each), count (uint32)
+#   count entries of fixed size: first probe row, col (uint16 each), then the
+#   mine bitmap, bit r * cols + c set for a mine, padded to whole bytes
+MAGIC = b"MSBC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHHI")
+PROBE = struct.Struct("<HH")
+
+DIFFICULTIES = {
+    "easy": (9, 9, 10),
+    "interm": (16, 16, 40),
+    "expert": (16, 30, 99),
+}
+
+
+def write_corpus(path, n, rows, cols, mines, seed=None, first_probe=(0, 0)):
+    """
+    Write n boards to path. Mines are drawn the same way Minesweeper draws
+    them, never on the first probe, from a generator seeded with seed.
+    """
+    rng = random.Random(seed)
+    bitmap_size = (rows * cols + 7) // 8
+    fr, fc = first_probe
+    positions = [i for i in range(rows * cols) if i != fr * cols + fc]
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, mines, n))
+        for _ in range(n):
+            bits = 0
+            for i in rng.sample(positions, mines):
+                bits |= 1 << i
+            f.write(PROBE.pack(fr, fc))
+            f.write(bits.to_bytes(bitmap_size, "little"))
+    os.replace(tmp, path)
+
+
+def generate_corpora(directory, n, seed=None):
+    """One corpus file of n boards per difficulty, e.g. directory/easy.msbc."""
+    paths = {}
+    for label, (rows, cols, mines) in DIFFICULTIES.items():
+        paths[label] = os.path.join(directory, f"{label}.msbc")
+        write_corpus(paths[label], n, rows, cols, mines, seed=f"{seed}:{label}")
+    return paths
+
+
+class BoardCorpus:
+    """
+    Read-only view of a corpus file written by write_corpus.
+
+    The file is memory-mapped, so opening it is instant and processes that
+    open the same corpus share its pages. game(i) builds a Minesweeper on
+    board i straight from its packed bitmap; probe it at first_probe(i) to
+    replay the recorded start.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.mines, self.count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} board corpus")
+        self._bitmap_size = (self.rows * self.cols + 7) // 8
+        self._entry_size = PROBE.size + self._bitmap_size
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _offset(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(f"board {i} out of range for a corpus of {self.count}")
+        return HEADER.size + i * self._entry_size
+
+    def first_probe(self, i):
+        return PROBE.unpack_from(self._map, self._offset(i))
+
+    def packed(self, i):
+        """Mine bitmap of board i as stored, bit r * cols + c set for a mine."""
+        start = self._offset(i) + PROBE.size
+        return self._map[start:start + self._bitmap_size]
+
+    def mines_of(self, i):
+        """Mine mask of board i as a list of rows of booleans."""
+        bits = int.from_bytes(self.packed(i), "little")
+        cols = self.cols
+        return [[bool(bits >> (r * cols + c) & 1) for c in range(cols)] for r in range(self.rows)]
+
+    def game(self, i, cls=Minesweeper):
+        return cls.from_packed(self.rows, self.cols, self.packed(i), self.mines)
+
+
+if __name__ == "__main__":
+    generate_corpora("corpus", n=5000, seed=0)
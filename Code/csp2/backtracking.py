@@ -1,5 +1,7 @@
 from csp_modelling import Constraint, Variable, CSP
 from constraints import *
+from collections import deque
+from time import perf_counter
 import random
 
 class UnassignedVars:
@@ -14,14 +16,17 @@ class UnassignedVars:
                    csp.variables()[0] before csp.variables()[1]
        'mrv'    == select the variable with minimum values in its current domain
                    break ties by the ordering in the CSP variables.
+       rng is the random.Random (or the random module) that 'random' draws from.
     '''
-    def __init__(self, select_criteria, csp):
+    def __init__(self, select_criteria, csp, rng=random):
         if select_criteria not in ['random', 'fixed', 'mrv']:
             print("Error UnassignedVars given an illegal selection criteria {}. Must be one of 'random', "
                   "'stack', 'queue', or 'mrv'".format(select_criteria))
         self.unassigned = list(csp.variables())
         self.csp = csp
         self._select = select_criteria
+        self._rng = rng
+        self._order = {v: i for i, v in enumerate(self.unassigned)}
         if select_criteria == 'fixed':
             #reverse unassigned list so that we can add and extract from the back
             self.unassigned.reverse()
@@ -31,7 +36,7 @@ class UnassignedVars:
             pass #print "Warning, extracting from empty unassigned list"
             return None
         if self._select == 'random':
-            i = random.randint(0,len(self.unassigned)-1)
+            i = self._rng.randint(0,len(self.unassigned)-1)
             nxtvar = self.unassigned[i]
             self.unassigned[i] = self.unassigned[-1]
             self.unassigned.pop()
@@ -39,7 +44,7 @@ class UnassignedVars:
         if self._select == 'fixed':
             return self.unassigned.pop()
         if self._select == 'mrv':
-            nxtvar = min(self.unassigned, key=lambda v: v.curDomainSize())
+            nxtvar = min(self.unassigned, key=lambda v: (v.curDomainSize(), self._order[v]))
             self.unassigned.remove(nxtvar)
             return nxtvar
 
@@ -47,29 +52,101 @@ class UnassignedVars:
         return len(self.unassigned) == 0
 
     def insert(self, var):
-        if not var in self.csp.variables():
+        if var not in self._order:
             pass #print "Error, trying to insert variable {} in unassigned that is not in the CSP problem".format(var.name())
         else:
             self.unassigned.append(var)
 
 
-def bt_search(algo, csp, variableHeuristic, allSolutions, trace, track_sol):
+class SearchContext:
+    '''State of one search (one call of bt_search or bt_count). Nothing
+       of a search is kept in globals, so searches over disjoint sets of
+       variables, e.g. the components of a board, can run side by side in
+       threads.
+
+       - trail: stack of the (var, value) pairs pruned from current
+         domains. Before propagating an assignment the search takes the
+         trail height (mark) and on backtrack it undoes back to it.
+       - nodesExplored, approximate: statistics of the search
+       - deadline, nodeBudget: the budget, see overBudget
+       - propagator: the SumPropagator of a 'GAC' search
+       - rng: where the 'random' variable heuristic draws from, the random
+         module unless a random.Random is given. It is kept across start(),
+         so a caller can give all its searches one stream of their own.
+    '''
+    __slots__ = ('trail', 'nodesExplored', 'deadline', 'nodeBudget', 'approximate', 'propagator', 'rng')
+
+    def __init__(self, rng=None):
+        self.rng = random if rng is None else rng
+        self.start(None, None)
+
+    def start(self, deadline, nodeBudget):
+        '''Reset the context for a new search. deadline is in seconds from
+           now, nodeBudget in nodes; None means no limit.'''
+        self.trail = []
+        self.nodesExplored = 0
+        self.deadline = None if deadline is None else perf_counter() + deadline
+        self.nodeBudget = nodeBudget
+        self.approximate = False
+        self.propagator = None
+
+    def prune(self, var, value):
+        var.removeVal(value)
+        self.trail.append((var, value))
+
+    def mark(self):
+        return len(self.trail)
+
+    def undo(self, height):
+        '''Restore every value pruned since the trail was at height.'''
+        trail = self.trail
+        for var, value in trail[height:]:
+            var.restoreVal(value)
+        del trail[height:]
+
+    def overBudget(self):
+        '''Called once per node after nodesExplored is incremented. Once
+           the budget is spent it sets approximate and stays True, so every
+           open node returns what it has found so far. The clock is only
+           read every 64 nodes.
+        '''
+        if self.approximate:
+            return True
+        if self.nodeBudget is not None and self.nodesExplored > self.nodeBudget:
+            self.approximate = True
+        elif (self.deadline is not None and self.nodesExplored % 64 == 0
+              and perf_counter() > self.deadline):
+            self.approximate = True
+        return self.approximate
+
+def bt_search(algo, csp, variableHeuristic, allSolutions, trace, track_sol,
+              deadline=None, nodeBudget=None, context=None, iterative=False):
     '''Main interface routine for calling different forms of backtracking search
-       algorithm is one of ['BT', 'FC', 'GAC']
+       algorithm is one of ['BT', 'FC', 'GAC', 'BIT']
        csp is a CSP object specifying the csp problem to solve
        variableHeuristic is one of ['random', 'fixed', 'mrv']
        allSolutions True or False. True means we want to find all solutions.
        trace True of False. True means turn on tracing of the algorithm
+       deadline (seconds) and nodeBudget bound the search. If either runs
+       out, the solutions found so far are returned and the context's
+       approximate is set to True.
+       context is the SearchContext to run in (a new one if None); read
+       its nodesExplored and approximate after the search. They are also
+       copied to bt_search.nodesExplored and bt_search.approximate, which
+       only make sense when one search runs at a time.
+       iterative True runs 'BT', 'FC' and 'GAC' with ITER, which keeps its
+       choice points on an explicit stack instead of recursing once per
+       variable. It explores the same tree in the same order.
 
        bt_search returns a list of solutions. Each solution is itself a list
        of pairs (var, value). Where var is a Variable object, and value is
        a value from its domain.
     '''
     varHeuristics = ['random', 'fixed', 'mrv']
-    algorithms = ['BT', 'FC', 'GAC']
+    algorithms = ['BT', 'FC', 'GAC', 'BIT']
 
-    #statistics
-    bt_search.nodesExplored = 0
+    ctx = SearchContext() if context is None else context
+    ctx.start(deadline, nodeBudget)
 
     if variableHeuristic not in varHeuristics:
         pass #print "Error. Unknown variable heursitics {}. Must be one of {}.".format(
@@ -78,24 +155,222 @@ def bt_search(algo, csp, variableHeuristic, allSolutions, trace, track_sol):
         pass #print "Error. Unknown algorithm heursitics {}. Must be one of {}.".format(
             #algo, algorithms)
 
-    uv = UnassignedVars(variableHeuristic, csp)
-    Variable.clearUndoDict()
+    uv = UnassignedVars(variableHeuristic, csp, ctx.rng)
     for v in csp.variables():
         v.reset()
-    if algo == 'BT':
-         solutions = BT(uv, csp, allSolutions, trace, track_sol)
-    elif algo == 'FC':
+    if algo == 'FC':
         for cnstr in csp.constraints():
             if cnstr.arity() == 1:
-                FCCheck(cnstr, None, None)  #FC with unary constraints at the root
-        solutions = FC(uv, csp, allSolutions, trace, track_sol)
+                FCCheck(ctx, cnstr)  #FC with unary constraints at the root
     elif algo == 'GAC':
-        GacEnforce(csp.constraints(), csp, None, None) #GAC at the root
-        solutions = GAC(uv, csp, allSolutions, trace, track_sol)
+        ctx.propagator = SumPropagator(csp, ctx)
+        GacEnforce(ctx, csp.constraints()) #GAC at the root
 
+    if iterative and algo in ('BT', 'FC', 'GAC'):
+        solutions = ITER(ctx, uv, csp, algo, allSolutions, trace, track_sol)
+    elif algo == 'BT':
+         solutions = BT(ctx, uv, csp, allSolutions, trace, track_sol)
+    elif algo == 'FC':
+        solutions = FC(ctx, uv, csp, allSolutions, trace, track_sol)
+    elif algo == 'GAC':
+        solutions = GAC(ctx, uv, csp, allSolutions, trace, track_sol)
+    elif algo == 'BIT':
+        bcsp = BitCSP(csp)
+        state = bcsp.propagate(0, 0, bcsp.full) #propagation at the root
+        solutions = 1 if track_sol else []
+        if state is not None:
+            solutions = BIT(ctx, bcsp, state[0], state[1], variableHeuristic, allSolutions, trace, track_sol)
+
+    bt_search.nodesExplored = ctx.nodesExplored
+    bt_search.approximate = ctx.approximate
     return solutions
 
-def BT(unAssignedVars, csp, allSolutions, trace, track_sol = None):
+class CountState:
+    '''Bookkeeping for bt_count. Tracks which variables are still
+       unassigned (as a bitmask over the CSP variable ordering) and the
+       residual target of every constraint, i.e., its target minus the
+       sum of its assigned variables. Together these identify the
+       remaining sub-problem, so they are used as the memo key.
+    '''
+    def __init__(self, csp):
+        cnstrs = csp.constraints()
+        self.index = {v: i for i, v in enumerate(csp.variables())}
+        self.consIdx = {v: [] for v in csp.variables()}
+        for ci, c in enumerate(cnstrs):
+            for v in c.scope():
+                self.consIdx[v].append(ci)
+        self.residual = [c.get_target() for c in cnstrs]
+        self.unassigned = (1 << len(self.index)) - 1
+
+    def key(self):
+        return (self.unassigned, tuple(self.residual))
+
+    def assign(self, var, val):
+        self.unassigned &= ~(1 << self.index[var])
+        if val:
+            for ci in self.consIdx[var]:
+                self.residual[ci] -= val
+
+    def unassign(self, var, val):
+        self.unassigned |= 1 << self.index[var]
+        if val:
+            for ci in self.consIdx[var]:
+                self.residual[ci] += val
+
+def polyAdd(acc, poly, shift):
+    '''acc += poly * x^shift. Polynomials are lists indexed by number of mines.'''
+    need = len(poly) + shift
+    if len(acc) < need:
+        acc.extend([0] * (need - len(acc)))
+    for k, n in enumerate(poly):
+        if n:
+            acc[k + shift] += n
+
+def bt_count(algo, csp, variableHeuristic, trace=False, deadline=None, nodeBudget=None, context=None):
+    '''Counting mode of bt_search for CSPs whose variables are 0/1 and whose
+       constraints are sum constraints (MSConstraint).
+
+       Instead of materialising every solution, the search memoizes the
+       count of each remaining sub-problem (see CountState), so identical
+       sub-problems reached along different branches are only solved once.
+
+       bt_count returns a pair (totals, mineCounts). totals[k] is the number
+       of solutions that use exactly k mines and mineCounts[var][k] is the
+       number of those solutions in which var = 1.
+
+       deadline, nodeBudget and context work as in bt_search. When the
+       budget runs out the counts only cover the part of the tree that was
+       searched, and the context's approximate is set to True.
+
+       Both counting engines, COUNT and BITCOUNT, keep their open nodes on
+       an explicit stack, so components of any length can be counted.
+    '''
+    ctx = SearchContext() if context is None else context
+    ctx.start(deadline, nodeBudget)
+    if algo == 'BIT':
+        totals, counts = bit_count(ctx, csp, variableHeuristic)
+    else:
+        totals, counts = var_count(ctx, algo, csp, variableHeuristic, trace)
+
+    bt_count.nodesExplored = ctx.nodesExplored
+    bt_count.approximate = ctx.approximate
+    return totals, counts
+
+def var_count(ctx, algo, csp, variableHeuristic, trace):
+    '''bt_count for the 'BT', 'FC' and 'GAC' algorithms.'''
+    uv = UnassignedVars(variableHeuristic, csp, ctx.rng)
+    for v in csp.variables():
+        v.reset()
+
+    totals, mineCounts = [], {}
+    ok = True
+    if algo == 'FC':
+        for cnstr in csp.constraints():
+            if cnstr.arity() == 1 and FCCheck(ctx, cnstr) == "DWO":
+                ok = False
+    elif algo == 'GAC':
+        ctx.propagator = SumPropagator(csp, ctx)
+        ok = GacEnforce(ctx, csp.constraints()) == "OK"
+
+    if ok:
+        totals, mineCounts = COUNT(ctx, uv, csp, algo, dict(), CountState(csp), trace)
+
+    width = len(totals)
+    counts = {}
+    for v in csp.variables():
+        poly = list(mineCounts.get(v, []))
+        poly.extend([0] * (width - len(poly)))
+        counts[v] = poly
+    return totals, counts
+
+def COUNT(ctx, unAssignedVars, csp, algo, memo, state, trace):
+    '''Counting search of bt_count for 'BT', 'FC' and 'GAC'. Each open
+       node is a frame [var, memo key, values, next value, trail height,
+       totals, mineCounts] on an explicit stack, as in ITER, so the depth
+       of the search is not limited by the Python stack. sub holds the
+       counts of the sub-problem that was just settled, which are added
+       to the node below it.
+    '''
+    prop = ctx.propagator
+    stack = []
+    enter = True
+    while True:
+        sub = None
+        if enter:
+            if unAssignedVars.empty():
+                sub = [1], {}
+            else:
+                key = state.key()
+                if key in memo:
+                    sub = memo[key]
+                else:
+                    ctx.nodesExplored += 1
+                    if ctx.overBudget():
+                        sub = [], {}
+                    else:
+                        var = unAssignedVars.extract()
+                        if trace: print("==>Counting {}".format(var.name()))
+                        stack.append([var, key, var.curDomain(), 0, None, [], {var: []}])
+
+        # Add sub to the innermost open node and move that node to its next
+        # consistent value, closing the nodes that have none left
+        enter = False
+        while not enter:
+            if not stack:
+                return sub
+            frame = stack[-1]
+            var, key, values, i, height, totals, mineCounts = frame
+            if height is not None:
+                val = values[i - 1]
+                if sub is not None:
+                    subTotals, subCounts = sub
+                    polyAdd(totals, subTotals, val)
+                    if val == 1:
+                        polyAdd(mineCounts[var], subTotals, 1)
+                    for v, poly in subCounts.items():
+                        if v not in mineCounts:
+                            mineCounts[v] = []
+                        polyAdd(mineCounts[v], poly, val)
+                    sub = None
+                state.unassign(var, val)
+                if prop:
+                    prop.undo(height)
+                else:
+                    ctx.undo(height)
+                frame[4] = None
+
+            if i == len(values):
+                stack.pop()
+                if prop:
+                    prop.unassign(var)
+                else:
+                    var.setValue(None)
+                unAssignedVars.insert(var)
+                memo[key] = sub = (totals, mineCounts)
+                continue
+
+            val = values[i]
+            frame[3] = i + 1
+            frame[4] = ctx.mark()
+            if prop:
+                prop.assign(var, val)
+            else:
+                var.setValue(val)
+            state.assign(var, val)
+
+            if algo == 'BT':
+                enter = all(cnstr.check() for cnstr in csp.constraintsOf(var)
+                            if cnstr.numUnassigned() == 0)
+            elif algo == 'FC':
+                enter = True
+                for cnstr in csp.constraintsOf(var):
+                    if cnstr.numUnassigned() == 1 and FCCheck(ctx, cnstr) == "DWO":
+                        enter = False
+                        break
+            else:
+                enter = GacEnforce(ctx, csp.constraintsOf(var)) == "OK"
+
+def BT(ctx, unAssignedVars, csp, allSolutions, trace, track_sol = None):
     if unAssignedVars.empty():
         if trace: print("{} Solution Found".format(csp.name()))
         soln = []
@@ -108,6 +383,9 @@ def BT(unAssignedVars, csp, allSolutions, trace, track_sol = None):
 
         return [soln]
 
+    ctx.nodesExplored += 1
+    if ctx.overBudget():
+        return 1 if track_sol else []
     solns = []
     nxtvar = unAssignedVars.extract()
 
@@ -125,7 +403,7 @@ def BT(unAssignedVars, csp, allSolutions, trace, track_sol = None):
                     break
 
         if constraintsOK:
-            new_solns = BT(unAssignedVars, csp, allSolutions, trace, track_sol)
+            new_solns = BT(ctx, unAssignedVars, csp, allSolutions, trace, track_sol)
             if not track_sol:
                 if new_solns:
                     solns.extend(new_solns)
@@ -140,13 +418,13 @@ def BT(unAssignedVars, csp, allSolutions, trace, track_sol = None):
     else:
         return solns
 
-def FCCheck(constraint, assignedVar, assignedVal):
+def FCCheck(ctx, constraint):
     var = constraint.unAssignedVars()[0]
 
-    for val in list(var.curDomain()):
+    for val in var.curDomain():
         var.setValue(val)
         if not constraint.check():
-            var.pruneValue(val, assignedVar, assignedVal)
+            ctx.prune(var, val)
         var.setValue(None)
 
         if var.curDomainSize() == 0:
@@ -154,7 +432,7 @@ def FCCheck(constraint, assignedVar, assignedVal):
 
     return "OK"
 
-def FC(unAssignedVars, csp, allSolutions, trace, track_sol = None):
+def FC(ctx, unAssignedVars, csp, allSolutions, trace, track_sol = None):
     if unAssignedVars.empty():
         soln = [(v, v.getValue()) for v in csp.variables()]
         if trace:
@@ -166,7 +444,9 @@ def FC(unAssignedVars, csp, allSolutions, trace, track_sol = None):
 
         return [soln]
 
-    bt_search.nodesExplored += 1
+    ctx.nodesExplored += 1
+    if ctx.overBudget():
+        return 1 if track_sol else []
     solns = []
 
     var = unAssignedVars.extract()
@@ -178,45 +458,138 @@ def FC(unAssignedVars, csp, allSolutions, trace, track_sol = None):
             print("==> {} = {}".format(var.name(), val))
 
         var.setValue(val)
+        height = ctx.mark()
         noDWO = True
 
         for constraint in csp.constraintsOf(var):
             if constraint.numUnassigned() == 1:
-                if FCCheck(constraint, var, val) == "DWO":
+                if FCCheck(ctx, constraint) == "DWO":
                     noDWO = False
                     break
 
         if noDWO:
-            new_solns = FC(unAssignedVars, csp, allSolutions, trace, track_sol)
+            new_solns = FC(ctx, unAssignedVars, csp, allSolutions, trace, track_sol)
             if not track_sol:
                 if new_solns:
                     solns.extend(new_solns)
                 if solns and not allSolutions:
-                    Variable.restoreValues(var, val)
+                    ctx.undo(height)
                     break
 
-        Variable.restoreValues(var, val)
+        ctx.undo(height)
 
     var.setValue(None)
     unAssignedVars.insert(var)
-    return solns
 
-def GacEnforce(cnstrs, csp, assignedVar, assignedVal):
-    while cnstrs:
-        cnstr = cnstrs.pop(0)
-        for var in cnstr.scope():
-            for val in var.curDomain():
-                if not cnstr.hasSupport(var, val):
-                    var.pruneValue(val, assignedVar, assignedVal)
-                    if var.curDomainSize() == 0:
-                        return "DWO"
-                    for recheck in csp.constraintsOf(var):
-                        if recheck != cnstr and not recheck in cnstrs:
-                            cnstrs.append(recheck)
+    if track_sol:
+        return 1
+    return solns
 
-    return "OK"
+class SumPropagator:
+    '''GAC for CSPs whose variables are 0/1 and whose constraints are sum
+       constraints (MSConstraint), as used by the 'GAC' algorithm.
+
+       A variable is fixed if it is assigned or its current domain has a
+       single value, and open otherwise. For every constraint the number of
+       variables fixed to 1 (ones) and to 0 (zeros) is kept up to date as
+       variables are assigned, pruned and restored. With free open
+       variables left, a constraint fails if ones > target or
+       ones + free < target, forces every open variable to 0 if
+       ones == target and to 1 if ones + free == target, and otherwise
+       supports both values of every open variable. Revising a constraint
+       is O(1), plus one step per variable it prunes.
+
+       Values are pruned on the trail of the SearchContext ctx. Variables
+       must be assigned, unassigned and restored through assign, unassign
+       and undo so that the counts stay right.
+    '''
+    def __init__(self, csp, ctx):
+        self.ctx = ctx
+        self.consOf = {v: [] for v in csp.variables()}
+        self.ones = {}
+        self.zeros = {}
+        for c in csp.constraints():
+            self.ones[c] = 0
+            self.zeros[c] = 0
+            for v in c.scope():
+                self.consOf[v].append(c)
+        for v in csp.variables():
+            val = self.fixedValue(v)
+            if val is not None:
+                self.fix(v, val)
+
+    @staticmethod
+    def fixedValue(var):
+        if var.isAssigned():
+            return var.getValue()
+        dom = var.curDomain()
+        return dom[0] if len(dom) == 1 else None
+
+    def fix(self, var, val):
+        counts = self.ones if val else self.zeros
+        for c in self.consOf[var]:
+            counts[c] += 1
+
+    def release(self, var, val):
+        counts = self.ones if val else self.zeros
+        for c in self.consOf[var]:
+            counts[c] -= 1
+
+    def assign(self, var, val):
+        old = self.fixedValue(var)
+        if old is not None:
+            self.release(var, old)
+        var.setValue(val)
+        self.fix(var, val)
 
-def GAC(unAssignedVars, csp, allSolutions, trace, track_sol = None):
+    def unassign(self, var):
+        self.release(var, var.getValue())
+        var.setValue(None)
+        val = self.fixedValue(var)
+        if val is not None:
+            self.fix(var, val)
+
+    def undo(self, height):
+        '''Restore every value pruned since the trail was at height.'''
+        trail = self.ctx.trail
+        for var, val in trail[height:]:
+            self.release(var, 1 - val)
+            var.restoreVal(val)
+        del trail[height:]
+
+    def enforce(self, cnstrs):
+        queue = deque(cnstrs)
+        queued = set(queue)
+        while queue:
+            cnstr = queue.popleft()
+            queued.discard(cnstr)
+            ones = self.ones[cnstr]
+            target = cnstr.get_target()
+            free = cnstr.arity() - ones - self.zeros[cnstr]
+            if ones > target or ones + free < target:
+                return "DWO"
+            if free == 0 or ones < target < ones + free:
+                continue
+
+            # Every open variable takes the value keep
+            keep = 0 if ones == target else 1
+            for var in cnstr.scope():
+                if var.isAssigned() or var.curDomainSize() != 2:
+                    continue
+                self.ctx.prune(var, 1 - keep)
+                self.fix(var, keep)
+                for recheck in self.consOf[var]:
+                    if recheck is not cnstr and recheck not in queued:
+                        queue.append(recheck)
+                        queued.add(recheck)
+
+        return "OK"
+
+def GacEnforce(ctx, cnstrs):
+    '''Enforce GAC on cnstrs with the propagator of the search ctx.'''
+    return ctx.propagator.enforce(cnstrs)
+
+def GAC(ctx, unAssignedVars, csp, allSolutions, trace, track_sol = None):
     if unAssignedVars.empty():
         if trace:
             pass # print("{} Solution Found".format(csp.name()))
@@ -230,32 +603,312 @@ def GAC(unAssignedVars, csp, allSolutions, trace, track_sol = None):
 
         return [soln]
 
-    bt_search.nodesExplored += 1
+    ctx.nodesExplored += 1
+    if ctx.overBudget():
+        return 1 if track_sol else []
     solns = []
     var = unAssignedVars.extract()
 
     if trace:
         pass # print("==>Trying {}".format(var.name()))
 
+    prop = ctx.propagator
     for val in var.curDomain():
         if trace:
             pass # print("==> {} = {}".format(var.name(), val))
-        var.setValue(val)
+        prop.assign(var, val)
+        height = ctx.mark()
         noDWO = True
 
-        if GacEnforce(csp.constraintsOf(var), csp, var, val) == "DWO":
+        if GacEnforce(ctx, csp.constraintsOf(var)) == "DWO":
             noDWO = False
 
         if noDWO:
-            new_solns = GAC(unAssignedVars, csp, allSolutions, trace, track_sol)
+            new_solns = GAC(ctx, unAssignedVars, csp, allSolutions, trace, track_sol)
             if not track_sol:
                 if new_solns:
                     solns.extend(new_solns)
                 if len(solns) > 0 and not allSolutions:
+                    prop.undo(height)
                     break
 
-        Variable.restoreValues(var, val)
+        prop.undo(height)
 
-    var.setValue(None)
+    prop.unassign(var)
     unAssignedVars.insert(var)
+
+    if track_sol:
+        return 1
+    return solns
+
+def ITER(ctx, unAssignedVars, csp, algo, allSolutions, trace, track_sol = None):
+    '''Non-recursive BT, FC and GAC. Each open node is a choice point
+       [var, values, next value, trail height] on an explicit stack, so
+       the depth of the search is not limited by the Python stack. Nodes
+       are visited, counted and propagated exactly as in the recursive
+       version of algo, and track_sol is called the same way.
+    '''
+    solns = []
+    stack = []
+    prop = ctx.propagator
+    found = False   # a solution was found and allSolutions is False
+    enter = True
+    while True:
+        if enter:
+            if unAssignedVars.empty():
+                soln = [(v, v.getValue()) for v in csp.variables()]
+                if trace: print("{} Solution Found".format(csp.name()))
+                if track_sol:
+                    track_sol(soln)
+                else:
+                    solns.append(soln)
+                    found = not allSolutions
+            else:
+                ctx.nodesExplored += 1
+                if not ctx.overBudget():
+                    var = unAssignedVars.extract()
+                    if trace: print("==>Trying {}".format(var.name()))
+                    values = var.domain() if algo == 'BT' else var.curDomain()
+                    stack.append([var, values, 0, None])
+
+        # Move the innermost open choice point to its next consistent value
+        enter = False
+        while stack and not enter:
+            point = stack[-1]
+            var, values, i, height = point
+            if height is not None:
+                if prop:
+                    prop.undo(height)
+                else:
+                    ctx.undo(height)
+                point[3] = None
+            if found or i == len(values):
+                stack.pop()
+                if prop:
+                    prop.unassign(var)
+                else:
+                    var.setValue(None)
+                unAssignedVars.insert(var)
+                continue
+
+            val = values[i]
+            point[2] = i + 1
+            if trace: print("==> {} = {}".format(var.name(), val))
+            if prop:
+                prop.assign(var, val)
+            else:
+                var.setValue(val)
+            point[3] = ctx.mark()
+
+            enter = True
+            if algo == 'BT':
+                for cnstr in csp.constraintsOf(var):
+                    if cnstr.numUnassigned() == 0 and not cnstr.check():
+                        enter = False
+                        break
+            elif algo == 'FC':
+                for cnstr in csp.constraintsOf(var):
+                    if cnstr.numUnassigned() == 1 and FCCheck(ctx, cnstr) == "DWO":
+                        enter = False
+                        break
+            else:
+                enter = GacEnforce(ctx, csp.constraintsOf(var)) == "OK"
+
+        if not enter:
+            break
+
+    if track_sol:
+        return 1
+    return solns
+
+class BitCSP:
+    '''Bitmask form of a CSP whose variables are 0/1 and whose constraints
+       are sum constraints (MSConstraint), used by the 'BIT' algorithm.
+
+       Variable i of csp.variables() is bit i. A constraint is its scope
+       mask and target. A search state is a pair of masks (ones, zeros)
+       holding the variables known to be 1 and known to be 0; a constraint
+       is evaluated with two popcounts instead of walking its scope.
+    '''
+    def __init__(self, csp):
+        self.variables = csp.variables()
+        index = {v: i for i, v in enumerate(self.variables)}
+        self.masks = []
+        self.targets = []
+        self.consOf = [[] for _ in self.variables]
+        for ci, c in enumerate(csp.constraints()):
+            mask = 0
+            for v in c.scope():
+                mask |= 1 << index[v]
+                self.consOf[index[v]].append(ci)
+            self.masks.append(mask)
+            self.targets.append(c.get_target())
+        self.full = (1 << len(self.variables)) - 1
+
+    def propagate(self, ones, zeros, changed):
+        '''Fix every variable forced by a single constraint, to a fixpoint.
+           changed is a mask of variables fixed since the last fixpoint.
+           Returns the new (ones, zeros), or None if a constraint fails.'''
+        pending = set()
+        while changed:
+            low = changed & -changed
+            pending.update(self.consOf[low.bit_length() - 1])
+            changed ^= low
+        while pending:
+            ci = pending.pop()
+            mask = self.masks[ci]
+            target = self.targets[ci]
+            nOnes = (mask & ones).bit_count()
+            free = mask & ~(ones | zeros)
+            nFree = free.bit_count()
+            if nOnes > target or nOnes + nFree < target:
+                return None
+            if not free:
+                continue
+            if nOnes == target:
+                zeros |= free
+            elif nOnes + nFree == target:
+                ones |= free
+            else:
+                continue
+            while free:
+                low = free & -free
+                pending.update(self.consOf[low.bit_length() - 1])
+                free ^= low
+        return ones, zeros
+
+    def pick(self, free, variableHeuristic, rng=random):
+        '''After propagation every free variable has both values left, so
+           'mrv' and 'fixed' both take the first free variable in CSP order.'''
+        if variableHeuristic == 'random':
+            bits = [i for i in range(len(self.variables)) if free >> i & 1]
+            return rng.choice(bits)
+        return (free & -free).bit_length() - 1
+
+    def solution(self, ones):
+        return [(v, ones >> i & 1) for i, v in enumerate(self.variables)]
+
+def BIT(ctx, bcsp, ones, zeros, variableHeuristic, allSolutions, trace, track_sol = None):
+    free = bcsp.full & ~(ones | zeros)
+    if not free:
+        soln = bcsp.solution(ones)
+        if trace: print("Solution Found")
+        if track_sol:
+            track_sol(soln)
+            return 1
+        return [soln]
+
+    ctx.nodesExplored += 1
+    if ctx.overBudget():
+        return 1 if track_sol else []
+    solns = []
+    i = bcsp.pick(free, variableHeuristic, ctx.rng)
+    if trace: print("==>Trying {}".format(bcsp.variables[i].name()))
+
+    for val in (0, 1):
+        if val:
+            state = bcsp.propagate(ones | 1 << i, zeros, 1 << i)
+        else:
+            state = bcsp.propagate(ones, zeros | 1 << i, 1 << i)
+        if state is None:
+            continue
+        new_solns = BIT(ctx, bcsp, state[0], state[1], variableHeuristic, allSolutions, trace, track_sol)
+        if not track_sol:
+            solns.extend(new_solns)
+            if solns and not allSolutions:
+                break
+
+    if track_sol:
+        return 1
     return solns
+
+def BITCOUNT(ctx, bcsp, ones, zeros, variableHeuristic, memo):
+    '''Counting mode of BIT. (ones, zeros) must already be propagated.
+       Returns (totals, mineCounts) over the free variables, with
+       mineCounts keyed by bit index. Like COUNT it keeps its open nodes
+       on an explicit stack, as frames [ones, zeros, memo key, bit, next
+       value, ones of the child being counted, totals, mineCounts].
+    '''
+    stack = []
+    enter = True
+    while True:
+        sub = None
+        if enter:
+            free = bcsp.full & ~(ones | zeros)
+            if not free:
+                sub = [1], {}
+            else:
+                # Only the ones inside constraints that still have free
+                # variables affect the remaining sub-problem
+                live = 0
+                for mask in bcsp.masks:
+                    if mask & free:
+                        live |= mask
+                key = (free, ones & live)
+                if key in memo:
+                    sub = memo[key]
+                else:
+                    ctx.nodesExplored += 1
+                    if ctx.overBudget():
+                        sub = [], {}
+                    else:
+                        i = bcsp.pick(free, variableHeuristic, ctx.rng)
+                        stack.append([ones, zeros, key, i, 0, None, [], {}])
+
+        enter = False
+        while not enter:
+            if not stack:
+                return sub
+            frame = stack[-1]
+            nodeOnes, nodeZeros, key, i, val, childOnes, totals, mineCounts = frame
+            if childOnes is not None:
+                subTotals, subCounts = sub
+                newOnes = childOnes & ~nodeOnes
+                shift = newOnes.bit_count()
+                polyAdd(totals, subTotals, shift)
+                while newOnes:
+                    low = newOnes & -newOnes
+                    polyAdd(mineCounts.setdefault(low.bit_length() - 1, []), subTotals, shift)
+                    newOnes ^= low
+                for j, poly in subCounts.items():
+                    polyAdd(mineCounts.setdefault(j, []), poly, shift)
+                sub = None
+                frame[5] = None
+
+            if val == 2:
+                stack.pop()
+                memo[key] = sub = (totals, mineCounts)
+                continue
+
+            frame[4] = val + 1
+            if val:
+                state = bcsp.propagate(nodeOnes | 1 << i, nodeZeros, 1 << i)
+            else:
+                state = bcsp.propagate(nodeOnes, nodeZeros | 1 << i, 1 << i)
+            if state is not None:
+                ones, zeros = state
+                frame[5] = ones
+                enter = True
+
+def bit_count(ctx, csp, variableHeuristic):
+    '''bt_count for the 'BIT' algorithm.'''
+    bcsp = BitCSP(csp)
+    state = bcsp.propagate(0, 0, bcsp.full)
+    if state is None:
+        return [], {v: [] for v in bcsp.variables}
+
+    ones, zeros = state
+    subTotals, subCounts = BITCOUNT(ctx, bcsp, ones, zeros, variableHeuristic, dict())
+    shift = ones.bit_count()
+    totals = []
+    polyAdd(totals, subTotals, shift)
+    counts = {}
+    for i, v in enumerate(bcsp.variables):
+        poly = []
+        if ones >> i & 1:
+            polyAdd(poly, subTotals, shift)
+        elif i in subCounts:
+            polyAdd(poly, subCounts[i], shift)
+        poly.extend([0] * (len(totals) - len(poly)))
+        counts[v] = poly
+    return totals, counts
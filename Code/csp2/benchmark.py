@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from csp_modelling import Variable, CSP
+from constraints import MSConstraint
+from backtracking import bt_search, SearchContext
+
+# Board positions taken from seeded games at the point solve_bt searched them.
+# A digit is a revealed cell, '.' a covered cell and 'F' a flag.
+POSITIONS = {
+    "easy_opening": [
+        "01.......",
+        "01.......",
+        "124......",
+        ".........",
+        ".........",
+        ".........",
+        ".........",
+        ".........",
+        ".........",
+    ],
+    "interm_frontier": [
+        "001.............",
+        "001.............",
+        "0012............",
+        "112.............",
+        "..2.............",
+        ".232............",
+        "................",
+        "................",
+        "................",
+        "................",
+        "................",
+        "................",
+        "................",
+        "................",
+        "................",
+        "................",
+    ],
+    "expert_split": [
+        "2F3101F112...................2",
+        "2FF101111F....................",
+        "1221000023....................",
+        "111000001F....................",
+        "1F10000023....................",
+        "222111223F..3212..............",
+        "F11F22FF4F4FF102F.............",
+        "22324F5F42222102..............",
+        "2F3F3F44F2000013..............",
+        "2F31223FF301111FF223.4.3......",
+        "221001F5F423F333312F..1.......",
+        "F100012F3FF4FF2F102F32.2......",
+        "110000112223F321102232.3......",
+        "1100000011123310001F2F3F......",
+        "F11110012F22FF310011213.......",
+        "111F1001F3F23FF10000001......1",
+    ],
+    "expert_giant": [
+        "000112F22FF21000001F11........",
+        "1101F212F33F2101122222..2.....",
+        "F21211011123F102F4F11F212.....",
+        "23F21000001F2113FF2111113.....",
+        "..4F10112244422F32100002F.....",
+        "...4312F3FFFFF2110112123F3....",
+        "...F..4...433221101F3F3F33....",
+        "..........22222F22323F43F2....",
+        ".........1..F..33FF224F312....",
+        "...................2..F201....",
+        "..................123.2213....",
+        "..............................",
+        "..............................",
+        "..............................",
+        "..............................",
+        "..............................",
+    ],
+}
+
+ALGORITHMS = ['BT', 'FC', 'GAC', 'BIT']
+HEURISTICS = ['fixed', 'random', 'mrv']
+
+# A random variable order makes BT/FC/GAC explore a tree far too large to
+# finish on the expert positions; these cases only run with --all
+SLOW = {(position, algo, 'random') for position in ("expert_split", "expert_giant")
+        for algo in ('BT', 'FC', 'GAC')}
+
+
+def position_csp(name, rows):
+    '''
+    The CSP solve_bt would search on a position: one 0/1 variable per
+    covered cell next to a number, one MSConstraint per number.
+    '''
+    n_rows, n_cols = len(rows), len(rows[0])
+    variables = {}
+    constraints = []
+    for r in range(n_rows):
+        for c in range(n_cols):
+            if not rows[r][c].isdigit():
+                continue
+            flagged = 0
+            scope = []
+            for rr in range(max(r - 1, 0), min(r + 2, n_rows)):
+                for cc in range(max(c - 1, 0), min(c + 2, n_cols)):
+                    if rows[rr][cc] == 'F':
+                        flagged += 1
+                    elif rows[rr][cc] == '.':
+                        if (rr, cc) not in variables:
+                            variables[(rr, cc)] = Variable(str(rr * n_cols + cc), [0, 1])
+                        scope.append(variables[(rr, cc)])
+            if scope:
+                constraints.append(MSConstraint(f"cell_{r}_{c}", scope, int(rows[r][c]) - flagged))
+    return CSP(name, list(variables.values()), constraints)
+
+
+def run_case(name, algo, heuristic, repeat=3, iterative=False):
+    '''
+    Search all solutions of a position. The time is the best of repeat runs;
+    the peak memory comes from one more run under tracemalloc, so tracing
+    does not slow the timed runs. iterative is passed on to bt_search.
+    '''
+    csp = position_csp(name, POSITIONS[name])
+    search = SearchContext()
+    best = None
+    for _ in range(repeat):
+        random.seed(0)
+        start = time.perf_counter()
+        solutions = bt_search(algo, csp, heuristic, True, False, None, context=search, iterative=iterative)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    random.seed(0)
+    tracemalloc.start()
+    bt_search(algo, csp, heuristic, True, False, None, iterative=iterative)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"position": name, "algo": algo, "heuristic": heuristic,
+            "engine": "iterative" if iterative else "recursive",
+            "variables": len(csp.variables()), "time": best,
+            "nodes": search.nodesExplored, "solutions": len(solutions),
+            "peak_kb": peak / 1024}
+
+
+def run_suite(positions=None, algos=ALGORITHMS, heuristics=HEURISTICS, repeat=3, run_slow=False,
+              iterative=False):
+    results = []
+    for name in positions or POSITIONS:
+        for algo in algos:
+            for heuristic in heuristics:
+                if (name, algo, heuristic) in SLOW and not run_slow:
+                    continue
+                res = run_case(name, algo, heuristic, repeat, iterative)
+                print("{position:>16} {algo:>4} {heuristic:>6}: {time:9.4f}s {nodes:>9} nodes "
+                      "{solutions:>8} solutions {peak_kb:10.1f} KB".format(**res), file=sys.stderr)
+                results.append(res)
+    return {"python": platform.python_version(), "results": results}
+
+
+def compare(old, new, tolerance=0.10, min_time=0.005):
+    '''
+    Print the time ratio of every case found in both runs and return the
+    cases that got slower by more than tolerance, or whose node or solution
+    counts changed (a change in the search itself, not just its speed).
+    Cases faster than min_time seconds are too noisy to call slower.
+    Cases are matched by position, algorithm and heuristic only, so a run
+    with --iterative can be compared against a recursive one.
+    '''
+    key = lambda res: (res["position"], res["algo"], res["heuristic"])
+    before = {key(res): res for res in old["results"]}
+    regressions = []
+    for res in new["results"]:
+        prev = before.get(key(res))
+        if prev is None:
+            continue
+        ratio = res["time"] / prev["time"] if prev["time"] else float("inf")
+        changed = res["nodes"] != prev["nodes"] or res["solutions"] != prev["solutions"]
+        flag = ""
+        if changed:
+            flag = "  <-- search changed"
+        elif ratio > 1 + tolerance and res["time"] > min_time:
+            flag = "  <-- slower"
+        print("{:>16} {:>4} {:>6}: {:9.4f}s -> {:9.4f}s  x{:.2f}{}".format(
+            *key(res), prev["time"], res["time"], ratio, flag))
+        if flag:
+            regressions.append(res)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bt_search on fixed Minesweeper positions.")
+    parser.add_argument("--out", help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--positions", nargs="+", choices=list(POSITIONS))
+    parser.add_argument("--algos", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--heuristics", nargs="+", choices=HEURISTICS, default=HEURISTICS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--all", action="store_true", help="also run the cases listed in SLOW")
+    parser.add_argument("--iterative", action="store_true",
+                        help="run BT, FC and GAC with the non-recursive engine (ITER)")
+    args = parser.parse_args()
+
+    results = run_suite(args.positions, args.algos, args.heuristics, args.repeat, args.all, args.iterative)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        sys.exit(1 if compare(old, results, args.tolerance) else 0)
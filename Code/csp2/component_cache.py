@@ -0,0 +1,148 @@
+import os
+import pickle
+from collections import OrderedDict
+
+# The 8 symmetries of the square grid
+SYMMETRIES = [
+    lambda r, c: (r, c),
+    lambda r, c: (r, -c),
+    lambda r, c: (-r, c),
+    lambda r, c: (-r, -c),
+    lambda r, c: (c, r),
+    lambda r, c: (c, -r),
+    lambda r, c: (-c, r),
+    lambda r, c: (-c, -r),
+]
+
+
+def canonical_form(variables, constraints, cols):
+    '''
+    Canonical key of a frontier component and its variables in canonical order.
+
+    Cells are placed on the grid, then every symmetry of the grid is applied
+    and the result is translated so its smallest row and column are 0. The
+    component is described by the sorted (scope cells, target) pairs of its
+    constraints, and the smallest description over all symmetries is the key.
+    Two components with the same key are the same CSP up to relabelling, so
+    their counts can be shared. The variables are returned sorted by their
+    cell in that same frame, which fixes the relabelling.
+    '''
+    coords = {v: divmod(int(v.name()), cols) for v in variables}
+    best = None
+    for sym in SYMMETRIES:
+        moved = {v: sym(r, c) for v, (r, c) in coords.items()}
+        min_r = min(p[0] for p in moved.values())
+        min_c = min(p[1] for p in moved.values())
+        points = {v: (r - min_r, c - min_c) for v, (r, c) in moved.items()}
+        key = tuple(sorted((tuple(sorted(points[v] for v in cnstr.scope())), cnstr.get_target())
+                           for cnstr in constraints))
+        if best is None or key < best[0]:
+            best = (key, points)
+    key, points = best
+    return key, sorted(variables, key=points.__getitem__)
+
+
+class ComponentCache:
+    '''
+    Bounded LRU cache of component counts, shared across turns and games.
+
+    Entries map canonical_form keys to (totals, mine_counts) in canonical
+    variable order, so a component that reappears anywhere on any board is
+    not searched again. If a path is given, the cache is loaded from it on
+    creation and written back by save(), so repeated runs start warm.
+
+    A cache in another process (e.g. a pool worker) hands what it learned
+    back with drain(), and the cache that save()s takes it in with merge().
+    '''
+    def __init__(self, maxsize=100000, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._added = {}  # keys stored since the last drain() and still cached
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, variables, constraints, cols, count):
+        '''
+        Return (totals, mine_counts) for the component, calling count() (which
+        must return the same pair, e.g. from bt_count) only on a miss. count()
+        may return None when it has no exact answer (e.g. the search ran out
+        of budget); nothing is cached then and lookup returns None.
+        '''
+        key, order = canonical_form(variables, constraints, cols)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            totals, canon_counts = entry
+            by_var = dict(zip(order, canon_counts))
+            return totals, {v: by_var[v] for v in variables}
+
+        self.misses += 1
+        result = count()
+        if result is None:
+            return None
+        totals, mine_counts = result
+        self._entries[key] = (totals, [mine_counts[v] for v in order])
+        self._added[key] = None
+        if len(self._entries) > self.maxsize:
+            self._added.pop(self._entries.popitem(last=False)[0], None)
+        return totals, mine_counts
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        self._entries.clear()
+        self._added.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def drain(self):
+        '''
+        (entries, hits, misses) since the last drain: the (key, entry) pairs
+        stored by lookup that are still cached, and the lookup statistics.
+        The statistics are reset, so nothing is counted twice by merge().
+        '''
+        entries = [(key, self._entries[key]) for key in self._added]
+        delta = (entries, self.hits, self.misses)
+        self._added = {}
+        self.hits = 0
+        self.misses = 0
+        return delta
+
+    def merge(self, entries, hits=0, misses=0):
+        '''Take in what drain() returned from another cache.'''
+        for key, entry in entries:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._added.pop(self._entries.popitem(last=False)[0], None)
+        self.hits += hits
+        self.misses += misses
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            entries = pickle.load(f)
+        for key, entry in entries:
+            self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def save(self, path=None):
+        path = path or self.path
+        if path is None:
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(list(self._entries.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
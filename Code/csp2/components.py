@@ -0,0 +1,134 @@
+from collections import deque
+
+
+class FrontierComponents:
+    """
+    Disjoint-set forest over the frontier cells (keyed by flat cell index,
+    i.e., int(var.name())) that tracks which cells are linked by a common
+    constraint.
+
+    Adding a constraint merges the sets of its cells. Removing one can only
+    split the set it belonged to, so that set is marked and re-split on the
+    next call to components(); every other set is left alone. The
+    (variables, constraints) pair of a component is cached until the
+    component changes, so a turn only pays for the cells that changed.
+
+    Constraint collections are dicts used as insertion-ordered sets, so
+    the variable order handed to the search does not depend on object ids.
+    """
+
+    def __init__(self):
+        self._parent = {}      # cell index -> parent cell index
+        self._members = {}     # root -> set of cell indices in its component
+        self._comp_cons = {}   # root -> constraints of its component
+        self._cons_of = {}     # cell index -> constraints containing it
+        self._vars = {}        # cell index -> Variable
+        self._touched = set()  # roots that lost a constraint since the last split
+        self._cache = {}       # root -> (variables, constraints)
+
+    def __len__(self):
+        self._split_touched()
+        return len(self._members)
+
+    def find(self, i):
+        parent = self._parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def add(self, constraint):
+        idxs = []
+        for v in constraint.scope():
+            i = int(v.name())
+            if i not in self._parent:
+                self._parent[i] = i
+                self._members[i] = {i}
+                self._comp_cons[i] = {}
+                self._cons_of[i] = {}
+                self._vars[i] = v
+            self._cons_of[i][constraint] = None
+            idxs.append(i)
+
+        root = self.find(idxs[0])
+        for i in idxs[1:]:
+            root = self._union(root, self.find(i))
+        self._comp_cons[root][constraint] = None
+        self._cache.pop(root, None)
+
+    def remove(self, constraint):
+        root = None
+        for v in constraint.scope():
+            i = int(v.name())
+            self._cons_of[i].pop(constraint, None)
+            root = self.find(i)
+        self._comp_cons[root].pop(constraint, None)
+        self._cache.pop(root, None)
+        self._touched.add(root)
+
+    def _union(self, ra, rb):
+        if ra == rb:
+            return ra
+        if len(self._members[ra]) < len(self._members[rb]):
+            ra, rb = rb, ra
+        self._parent[rb] = ra
+        self._members[ra] |= self._members.pop(rb)
+        self._comp_cons[ra] |= self._comp_cons.pop(rb)
+        self._cache.pop(ra, None)
+        self._cache.pop(rb, None)
+        if rb in self._touched:
+            self._touched.discard(rb)
+            self._touched.add(ra)
+        return ra
+
+    def _split_touched(self):
+        for root in self._touched:
+            members = self._members.pop(root)
+            self._comp_cons.pop(root)
+            for i in members:
+                if not self._cons_of[i]:
+                    del self._parent[i], self._cons_of[i], self._vars[i]
+
+            seen = set()
+            for start in members:
+                if start in seen or start not in self._parent:
+                    continue
+                comp, cons = self._bfs(start)
+                seen.update(comp)
+                for i in comp:
+                    self._parent[i] = start
+                self._members[start] = set(comp)
+                self._comp_cons[start] = cons
+        self._touched.clear()
+
+    def _bfs(self, start):
+        """Cells reachable from start in BFS order, and the constraints met."""
+        order = [start]
+        seen = {start}
+        cons = {}
+        q = deque([start])
+        while q:
+            for c in self._cons_of[q.popleft()]:
+                if c in cons:
+                    continue
+                cons[c] = None
+                for v in c.scope():
+                    i = int(v.name())
+                    if i not in seen:
+                        seen.add(i)
+                        order.append(i)
+                        q.append(i)
+        return order, cons
+
+    def components(self):
+        """List of (variables, constraints) pairs, one per component."""
+        self._split_touched()
+        comps = []
+        for root in self._members:
+            if root not in self._cache:
+                order, cons = self._bfs(root)
+                self._cache[root] = ([self._vars[i] for i in order], list(cons))
+            comps.append(self._cache[root])
+        return comps
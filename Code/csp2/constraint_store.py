@@ -0,0 +1,133 @@
+from constraints import MSConstraint
+from components import FrontierComponents
+from Code.minesweeper import neighbour_table
+
+
+class ConstraintStore:
+    """
+    Maintains the MSConstraint of every revealed number cell that still
+    borders covered cells, updating it from the cells that changed rather
+    than rescanning the board.
+
+    - reveal(cells): the cells were just revealed. They leave the scope of
+      the constraints that contained them, and each revealed number gets
+      its own constraint.
+    - flag(cells): the cells were just flagged. They leave the scopes that
+      contained them and those targets drop by one.
+
+    A constraint whose scope becomes empty is retired. Constraints are
+    replaced rather than mutated, so a CSP built from constraints() stays
+    valid until it is discarded. Every change is forwarded to a
+    FrontierComponents, so components() is kept up to date as well.
+    """
+
+    def __init__(self, game, index_to_var):
+        self.game = game
+        self.index_to_var = index_to_var
+        if getattr(game, "sparse", False):
+            # A table for a huge board would cost more than the board itself
+            self._neighbours = self._bounded_neighbours
+        else:
+            self._neighbours = neighbour_table(game.rows, game.cols).cells
+        self._by_cell = {}   # revealed (r, c) -> MSConstraint
+        self._watchers = {}  # covered (r, c) -> revealed cells whose constraint contains it
+        self.frontier = FrontierComponents()
+
+    def __len__(self):
+        return len(self._by_cell)
+
+    def constraints(self):
+        return list(self._by_cell.values())
+
+    def components(self):
+        """List of (variables, constraints) pairs, one per frontier component."""
+        return self.frontier.components()
+
+    def constraint_of(self, r, c):
+        return self._by_cell.get((r, c))
+
+    def constraints_if_flagged(self, cells, constraints=None):
+        """
+        constraints (by default all of them) as flag(cells) would leave them,
+        without changing the store. Only the constraints that contain one of
+        the cells are replaced.
+        """
+        dropped = {}  # constraint -> its variables among cells
+        for cell in cells:
+            var = self.index_to_var[cell]
+            for owner in self._watchers.get(cell, ()):
+                dropped.setdefault(self._by_cell[owner], set()).add(var)
+
+        result = []
+        for cnstr in self.constraints() if constraints is None else constraints:
+            gone = dropped.get(cnstr)
+            if not gone:
+                result.append(cnstr)
+                continue
+            scope = [v for v in cnstr.scope() if v not in gone]
+            if scope:
+                result.append(MSConstraint(cnstr.name(), scope, cnstr.get_target() - len(gone)))
+        return result
+
+    def rebuild(self):
+        """Drop everything and rebuild the store from the whole board."""
+        self._by_cell.clear()
+        self._watchers.clear()
+        self.frontier = FrontierComponents()
+        game = self.game
+        self.reveal((r, c) for r in range(game.rows) for c in range(game.cols)
+                    if game.revealed[r][c])
+
+    def reveal(self, cells):
+        cells = list(cells)
+        for cell in cells:
+            self._detach(cell, 0)
+        for cell in cells:
+            self._add(cell)
+
+    def flag(self, cells):
+        for cell in cells:
+            self._detach(cell, 1)
+
+    def _add(self, cell):
+        game = self.game
+        r, c = cell
+        n = game.get_cell_number(r, c)
+        if n is None or n == game.MINE:
+            return
+
+        flagged = 0
+        covered = []
+        for rr, cc in self._neighbours(r, c):
+            if game.flagged[rr][cc]:
+                flagged += 1
+            elif not game.revealed[rr][cc]:
+                covered.append((rr, cc))
+        if not covered:
+            return
+
+        cnstr = MSConstraint(f"cell_{r}_{c}", [self.index_to_var[nb] for nb in covered], n - flagged)
+        self._by_cell[cell] = cnstr
+        self.frontier.add(cnstr)
+        for nb in covered:
+            self._watchers.setdefault(nb, set()).add(cell)
+
+    def _bounded_neighbours(self, r, c):
+        rows, cols = self.game.rows, self.game.cols
+        return [(rr, cc) for rr in range(max(r - 1, 0), min(r + 2, rows))
+                for cc in range(max(c - 1, 0), min(c + 2, cols)) if (rr, cc) != (r, c)]
+
+    def _detach(self, cell, mine):
+        """Remove a no longer covered cell from every scope containing it."""
+        owners = self._watchers.pop(cell, None)
+        if not owners:
+            return
+        var = self.index_to_var[cell]
+        for owner in owners:
+            old = self._by_cell.pop(owner)
+            self.frontier.remove(old)
+            scope = [v for v in old.scope() if v is not var]
+            if scope:
+                cnstr = MSConstraint(f"cell_{owner[0]}_{owner[1]}", scope, old.get_target() - mine)
+                self._by_cell[owner] = cnstr
+                self.frontier.add(cnstr)
@@ -9,6 +9,8 @@ class MSConstraint(Constraint):
     The target sum is (revealed_number − flagged_neighbors) for that cell.
     """
 
+    __slots__ = ('_target',)
+
     def __init__(self, name, scope, target_mine_count):
         """
         Args:
@@ -10,8 +10,15 @@ class Variable:
       domain for the variable. Values pruned from the variable domain
       are removed from the current domain but not from the original
       domain. Values can be also restored.
+
+      pruneValue records every pruned value in the class-wide undoDict
+      under the (variable, value) assignment that caused it. The searches
+      in backtracking.py do not use it: they prune with removeVal and keep
+      their own trail (see SearchContext), so they do not share state.
     '''
 
+    __slots__ = ('_name', '_dom', '_curdom', '_value')
+
     undoDict = dict()  # stores pruned values indexed by a
 
     # (variable,value) reason pair
@@ -20,7 +27,7 @@ class Variable:
         string) and domain of values.
         '''
         self._name = name  # text name for variable
-        self._dom = list(domain)  # Make a copy of passed domain
+        self._dom = tuple(domain)  # original domain, never modified
         self._curdom = list(domain)  # using list
         self._value = None
 
@@ -28,16 +35,16 @@ class Variable:
         return "Variable {}".format(self._name)
 
     def domain(self):
-        '''return copy of variable domain'''
-        return (list(self._dom))
+        '''return variable domain (a read-only tuple)'''
+        return self._dom
 
     def domainSize(self):
         '''Return the size of the domain'''
-        return (len(self.domain()))
+        return len(self._dom)
 
     def resetDomain(self, newdomain):
         '''reset the domain of this variable'''
-        self._dom = newdomain
+        self._dom = tuple(newdomain)
 
     def getValue(self):
         return self._value
@@ -53,7 +60,7 @@ class Variable:
         self.setValue(None)
 
     def isAssigned(self):
-        return self.getValue() != None
+        return self._value is not None
 
     def name(self):
         return self._name
@@ -61,29 +68,33 @@ class Variable:
     def curDomain(self):
         '''return copy of variable current domain. But if variable is assigned
            return just its assigned value (this makes implementing hasSupport easier'''
-        if self.isAssigned():
-            return ([self.getValue()])
-        return (list(self._curdom))
+        if self._value is not None:
+            return (self._value,)
+        return tuple(self._curdom)
 
     def curDomainSize(self):
         '''Return the size of the current domain'''
-        if self.isAssigned():
-            return (1)
-        return (len(self._curdom))
+        if self._value is not None:
+            return 1
+        return len(self._curdom)
 
     def inCurDomain(self, value):
         '''check if value is in current domain'''
-        if self.isAssigned():
-            return (value == self.getValue())
-        return (value in self._curdom)
+        if self._value is not None:
+            return value == self._value
+        return value in self._curdom
 
-    def pruneValue(self, value, reasonVar, reasonVal):
-        '''Remove value from current domain'''
+    def removeVal(self, value):
+        '''Remove value from current domain without recording it'''
         try:
             self._curdom.remove(value)
-        except:
+        except ValueError:
             print("Error: tried to prune value {} from variable {}'s domain, but value not present!".format(value,
                                                                                                             self._name))
+
+    def pruneValue(self, value, reasonVar, reasonVal):
+        '''Remove value from current domain'''
+        self.removeVal(value)
         dkey = (reasonVar, reasonVal)
         if not dkey in Variable.undoDict:
             Variable.undoDict[dkey] = []
@@ -93,7 +104,7 @@ class Variable:
         self._curdom.append(value)
 
     def restoreCurDomain(self):
-        self._curdom = self.domain()
+        self._curdom = list(self._dom)
 
     def reset(self):
         self.restoreCurDomain()
@@ -131,17 +142,23 @@ class Constraint:
        the constraint's scope. IMPORTANT, the scope is ordered! E.g.,
        the constraint greaterThan(V1,V2) is not the same as the
        contraint greaterThan(V2,V1).
+
+       The scope is stored as a tuple and scope() returns it without
+       copying.
     '''
 
+    __slots__ = ('_scope', '_name')
+
     def __init__(self, name, scope):
         '''create a constraint object, specify the constraint name (a
         string) and its scope (an ORDERED list of variable
         objects).'''
-        self._scope = list(scope)
+        self._scope = tuple(scope)
         self._name = "baseClass_" + name
 
     def scope(self):
-        return list(self._scope)
+        '''return the scope (a read-only tuple)'''
+        return self._scope
 
     def arity(self):
         return len(self._scope)
@@ -149,12 +166,12 @@ class Constraint:
     def numUnassigned(self):
         i = 0
         for var in self._scope:
-            if not var.isAssigned():
+            if var._value is None:
                 i += 1
         return i
 
     def unAssignedVars(self):
-        return [var for var in self.scope() if not var.isAssigned()]
+        return [var for var in self._scope if var._value is None]
 
     # def check(self):
     #     util.raiseNotDefined()
@@ -175,54 +192,68 @@ class CSP:
     '''CSP class groups together a set of variables and a set of
        constraints to form a CSP problem. Provides a useful place
        to put some other functions that depend on which variables
-       and constraints are active'''
+       and constraints are active.
+
+       Each variable gets an integer id, its position in the list of
+       variables (see varIndex). variables(), constraints() and
+       constraintsOf() return read-only tuples without copying.'''
+
+    __slots__ = ('_name', '_variables', '_constraints', '_index', 'constraints_of')
 
     def __init__(self, name, variables, constraints):
         '''create a CSP problem object passing it a name, a list of
            variable objects, and a list of constraint objects'''
         self._name = name
-        self._variables = variables
-        self._constraints = constraints
+        self._variables = tuple(variables)
+        self._constraints = tuple(constraints)
+        self._index = {v: i for i, v in enumerate(self._variables)}
 
         # some sanity checks
         varsInCnst = set()
-        for c in constraints:
-            varsInCnst = varsInCnst.union(c.scope())
-        for v in variables:
+        for c in self._constraints:
+            varsInCnst.update(c.scope())
+        for v in self._variables:
             if v not in varsInCnst:
                 print("Warning: variable {} is not in any constraint of the CSP {}".format(v.name(), self.name()))
         for v in varsInCnst:
-            if v not in variables:
+            if v not in self._index:
                 print(
                     "Error: variable {} appears in constraint but specified as one of the variables of the CSP {}".format(
                         v.name(), self.name()))
 
-        self.constraints_of = [[] for i in range(len(variables))]
-        for c in constraints:
+        constraints_of = [[] for i in range(len(self._variables))]
+        for c in self._constraints:
             for v in c.scope():
-                i = variables.index(v)
-                self.constraints_of[i].append(c)
+                i = self._index.get(v)
+                if i is not None:
+                    constraints_of[i].append(c)
+        self.constraints_of = [tuple(cs) for cs in constraints_of]
 
     def name(self):
         return self._name
 
     def variables(self):
-        return list(self._variables)
+        return self._variables
 
     def constraints(self):
-        return list(self._constraints)
+        return self._constraints
+
+    def varIndex(self, var):
+        '''return the integer id of var in this CSP, or None if var
+           is not one of its variables'''
+        return self._index.get(var)
 
     def constraintsOf(self, var):
         '''return constraints with var in their scope'''
-        try:
-            i = self.variables().index(var)
-            return list(self.constraints_of[i])
-        except:
+        i = self._index.get(var)
+        if i is None:
             print("Error: tried to find constraint of variable {} that isn't in this CSP {}".format(var, self.name()))
+            return ()
+        return self.constraints_of[i]
 
     def unAssignAllVars(self):
         '''unassign all variables'''
-        for v in self.variables():
+        for v in self._variables:
             v.unAssign()
 
     def check(self, solutions):
@@ -0,0 +1,167 @@
+import struct
+import zlib
+
+from Code.minesweeper import Minesweeper
+
+# Moves are (action, source, r, c)
+PROBE, FLAG = 0, 1
+FIRST, DEDUCED, FORCED, GUESSED = 0, 1, 2, 3
+SOURCES = {FIRST: "first probe", DEDUCED: "deduced", FORCED: "forced by search", GUESSED: "guess"}
+
+# File layout (little endian):
+#   b"MSTR", version (uint16)
+#   one zlib-compressed block per game, see _pack_game
+#   index: (offset, length) as uint64 pairs, one per game
+#   footer: index offset (uint64), number of games (uint32), b"MSTR"
+MAGIC = b"MSTR"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+FOOTER = struct.Struct("<QI4s")
+INDEX_ENTRY = struct.Struct("<QQ")
+GAME_HEADER = struct.Struct("<HHHBIH")  # rows, cols, mines, won, number of moves, seed length
+
+
+class GameTrace:
+    """One game of a trace: its board, seed, result and moves."""
+
+    def __init__(self, rows, cols, mines, won, seed, moves):
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines  # mines[r][c] is True where a mine is
+        self.won = won
+        self.seed = seed
+        self.moves = moves
+
+    def guesses(self):
+        return sum(1 for _, source, _, _ in self.moves if source == GUESSED)
+
+
+def _pack_game(trace):
+    seed = b"" if trace.seed is None else str(trace.seed).encode()
+    cells = trace.rows * trace.cols
+    bits = 0
+    for r in range(trace.rows):
+        for c in range(trace.cols):
+            if trace.mines[r][c]:
+                bits |= 1 << (r * trace.cols + c)
+    n_mines = bin(bits).count("1")
+    moves = [(r * trace.cols + c) << 3 | source << 1 | action for action, source, r, c in trace.moves]
+    return (GAME_HEADER.pack(trace.rows, trace.cols, n_mines, trace.won, len(moves), len(seed))
+            + seed
+            + bits.to_bytes((cells + 7) // 8, "little")
+            + struct.pack(f"<{len(moves)}I", *moves))
+
+
+def _unpack_game(data):
+    rows, cols, _, won, n_moves, seed_len = GAME_HEADER.unpack_from(data)
+    pos = GAME_HEADER.size
+    seed = data[pos:pos + seed_len].decode() if seed_len else None
+    pos += seed_len
+    size = (rows * cols + 7) // 8
+    bits = int.from_bytes(data[pos:pos + size], "little")
+    pos += size
+    mines = [[bool(bits >> (r * cols + c) & 1) for c in range(cols)] for r in range(rows)]
+    moves = []
+    for code in struct.unpack_from(f"<{n_moves}I", data, pos):
+        r, c = divmod(code >> 3, cols)
+        moves.append((code & 1, code >> 1 & 3, r, c))
+    return GameTrace(rows, cols, mines, bool(won), seed, moves)
+
+
+class TraceWriter:
+    """
+    Writes the games of a run to a single file. Each game is compressed on
+    its own and appended through a buffered file; the index of game offsets
+    is written by close(), so TraceReader can seek straight to any game.
+    """
+
+    def __init__(self, path, level=6):
+        self.path = path
+        self.level = level
+        self._offsets = []
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_game(self, trace):
+        block = zlib.compress(_pack_game(trace), self.level)
+        self._offsets.append((self._file.tell(), len(block)))
+        self._file.write(block)
+
+    def close(self):
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        for entry in self._offsets:
+            self._file.write(INDEX_ENTRY.pack(*entry))
+        self._file.write(FOOTER.pack(index_offset, len(self._offsets), MAGIC))
+        self._file.close()
+
+
+class TraceReader:
+    """Random access to the games of a file written by TraceWriter."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        magic, version = HEADER.unpack(self._file.read(HEADER.size))
+        self._file.seek(-FOOTER.size, 2)
+        index_offset, count, end_magic = FOOTER.unpack(self._file.read(FOOTER.size))
+        if magic != MAGIC or end_magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a complete version {VERSION} game trace")
+        self._file.seek(index_offset)
+        self._offsets = list(INDEX_ENTRY.iter_unpack(self._file.read(count * INDEX_ENTRY.size)))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def game(self, i):
+        offset, length = self._offsets[i]
+        self._file.seek(offset)
+        return _unpack_game(zlib.decompress(self._file.read(length)))
+
+
+def render(trace):
+    """
+    Replay a GameTrace and yield the same text the per-game txt logs held:
+    the board before every move, labelled with the move, and the final board.
+    """
+    game = Minesweeper.from_mines(trace.mines)
+    for action, source, r, c in trace.moves:
+        yield game.get_board_str()
+        yield f"{'Flag' if action == FLAG else 'Probe'} ({r}, {c}): {SOURCES[source]}\n"
+        if action == FLAG:
+            game.toggle_flag(r, c)
+        else:
+            game.probe(r, c)
+    yield game.get_board_str()
+    yield "Won" if trace.won else "Lost"
+
+
+if __name__ == "__main__":
+    import sys
+
+    with TraceReader(sys.argv[1]) as reader:
+        games = [int(i) for i in sys.argv[2:]] or range(len(reader))
+        for i in games:
+            print(f"Game {i}")
+            for text in render(reader.game(i)):
+                print(text)
+            print()
@@ -0,0 +1,153 @@
+import math
+
+
+class LogBinomial:
+    '''Table of log-factorials, so that log C(n, k) can be read in O(1).
+       The table grows on demand, so one instance can be shared by every
+       board size.
+    '''
+    def __init__(self, n=0):
+        self._logFact = [0.0]
+        self.extend(n)
+
+    def extend(self, n):
+        logFact = self._logFact
+        for i in range(len(logFact), n + 1):
+            logFact.append(logFact[-1] + math.log(i))
+
+    def __call__(self, n, k):
+        if k < 0 or k > n:
+            return -math.inf
+        if n >= len(self._logFact):
+            self.extend(n)
+        logFact = self._logFact
+        return logFact[n] - logFact[k] - logFact[n - k]
+
+
+LOG_BINOMIAL = LogBinomial()
+
+
+def log_sum_exp(values):
+    top = max(values, default=-math.inf)
+    if top == -math.inf:
+        return -math.inf
+    return top + math.log(sum(math.exp(x - top) for x in values))
+
+
+def log_poly(poly):
+    '''Histogram of counts -> histogram of log-counts.'''
+    return [math.log(n) if n > 0 else -math.inf for n in poly]
+
+
+def log_convolve(a, b):
+    '''Convolution of two histograms given in log space.'''
+    if not a or not b:
+        return []
+    out = [[] for _ in range(len(a) + len(b) - 1)]
+    for i, x in enumerate(a):
+        if x == -math.inf:
+            continue
+        for j, y in enumerate(b):
+            if y != -math.inf:
+                out[i + j].append(x + y)
+    return [log_sum_exp(terms) for terms in out]
+
+
+def estimate_component(variables, constraints, log_binom=LOG_BINOMIAL):
+    '''
+    Cheap stand-in for bt_count on a component whose search ran out of budget.
+
+    Each cell gets the mean density target / len(scope) of the constraints
+    on it. The result is shaped like bt_count's (totals, mine_counts), with
+    float counts: the number of mines k of the n cells is spread binomially
+    around the mean density p, totals[k] = C(n, k) p^k (1 - p)^(n - k), and
+    given k mines a cell is a mine with probability k / n scaled by its own
+    density over p, so sum(mine_counts[var]) is the density of var. The
+    spread lets combine_components weigh this component's mine count
+    against the others and the unconstrained cells instead of fixing it.
+    The densities are estimates, so no cell may be treated as forced
+    because of them.
+    '''
+    sums = {v: 0.0 for v in variables}
+    seen = {v: 0 for v in variables}
+    for cnstr in constraints:
+        density = cnstr.get_target() / len(cnstr.scope())
+        for v in cnstr.scope():
+            sums[v] += density
+            seen[v] += 1
+
+    density = {v: sums[v] / seen[v] if seen[v] else 0.0 for v in variables}
+    n = len(variables)
+    p = sum(density.values()) / n if n else 0.0
+    if p <= 0.0 or p >= 1.0:
+        # Every cell is certain, so the count of mines is too
+        k = round(p * n)
+        totals = [0.0] * k + [1.0]
+        return totals, {v: [0.0] * k + [density[v]] for v in variables}
+
+    log_p, log_q = math.log(p), math.log1p(-p)
+    totals = [math.exp(log_binom(n, k) + k * log_p + (n - k) * log_q) for k in range(n + 1)]
+    mine_counts = {v: [min(t, t * k * density[v] / (n * p)) for k, t in enumerate(totals)]
+                   for v in variables}
+    return totals, mine_counts
+
+
+def combine_components(components, unconstrained, mines_left, log_binom=LOG_BINOMIAL):
+    '''
+    Combine the per-component solution counts into exact mine probabilities
+    for the whole board, taking the fixed total number of mines into account.
+
+    Args:
+        components: list of (totals, mine_counts) pairs as returned by
+                    bt_count. totals[k] is the number of solutions of the
+                    component that use k mines and mine_counts[var][k] the
+                    number of those with var = 1.
+        unconstrained (int): number of covered, unflagged cells that are not
+                             in any component.
+        mines_left (int): mines not yet flagged.
+
+    Every global configuration picks one solution per component and places
+    the remaining mines anywhere among the unconstrained cells, so a choice
+    of k_i mines per component has weight prod(totals_i[k_i]) *
+    C(unconstrained, mines_left - sum(k_i)).
+
+    Returns (prob_map, p_uncon): the mine probability of every component
+    variable and of any unconstrained cell. Returns (None, None) if no
+    global configuration is consistent with mines_left.
+    '''
+    hists = [log_poly(totals) for totals, _ in components]
+
+    # prefix[i] = convolution of hists[:i], suffix[i] = convolution of hists[i:]
+    prefix = [[0.0]]
+    for h in hists:
+        prefix.append(log_convolve(prefix[-1], h))
+    suffix = [[0.0]]
+    for h in reversed(hists):
+        suffix.append(log_convolve(h, suffix[-1]))
+    suffix.reverse()
+
+    def free_weight(s):
+        return log_binom(unconstrained, mines_left - s)
+
+    everything = prefix[-1]
+    log_total = log_sum_exp([x + free_weight(s) for s, x in enumerate(everything)])
+    if log_total == -math.inf:
+        return None, None
+
+    if unconstrained:
+        p_uncon = sum(math.exp(x + free_weight(s) - log_total) * (mines_left - s)
+                      for s, x in enumerate(everything) if x != -math.inf) / unconstrained
+    else:
+        p_uncon = 0.0
+
+    prob_map = {}
+    for i, (totals, mine_counts) in enumerate(components):
+        others = log_convolve(prefix[i], suffix[i + 1])
+        # weight[k] = P(component i uses k mines) / totals[k]
+        weight = [log_sum_exp([x + free_weight(k + s) for s, x in enumerate(others)]) - log_total
+                  for k in range(len(totals))]
+        for var, counts in mine_counts.items():
+            p = sum(math.exp(math.log(m) + weight[k]) for k, m in enumerate(counts) if m > 0)
+            prob_map[var] = min(1.0, p)
+
+    return prob_map, min(1.0, p_uncon)
@@ -0,0 +1,39 @@
+import os
+import time
+import uuid
+
+import numpy as np
+
+# Results of every saved run go to one dataset, partitioned hive-style:
+#   <root>/method=GAC/heuristic=safest/difficulty=expert/balance_param=0.25/part-<run>.npz
+# Each part holds the columns below, one entry per game. analysis/stat.py
+# loads the whole dataset into one table.
+PARTITION_KEYS = ("method", "heuristic", "difficulty", "balance_param")
+COLUMNS = {"game": np.int32, "won": np.bool_, "time": np.float64, "guesses": np.int32}
+
+
+def partition_dir(root, method, heuristic, difficulty, balance_param):
+    return os.path.join(root, f"method={method}", f"heuristic={heuristic}",
+                        f"difficulty={difficulty}", f"balance_param={float(balance_param)}")
+
+
+def new_run_id():
+    """Name of a run, unique and sorting by start time."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def write_part(root, method, heuristic, difficulty, balance_param, run=None, **columns):
+    """
+    Write one run's columns (see COLUMNS) as a new part of its partition and
+    return the path. Parts are never appended to, so runs cannot clobber
+    each other. run (a new_run_id() if None) names the part.
+    """
+    directory = partition_dir(root, method, heuristic, difficulty, balance_param)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-{run or new_run_id()}.npz")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **{name: np.asarray(columns[name], dtype=dtype)
+                                  for name, dtype in COLUMNS.items()})
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,102 @@
+import math
+import random
+
+from backtracking import BitCSP
+from probability import log_sum_exp
+
+
+LOG_2 = math.log(2)
+
+
+def sample_count(csp, samples=2000, rng=random):
+    '''Estimate of bt_count for CSPs too big to count exactly.
+
+       Each sample walks one random path down the search tree of the 'BIT'
+       algorithm: the first free variable is tried with both values, the
+       values that survive propagation are counted, one of them is taken at
+       random, and the weight of the path is multiplied by the number of
+       surviving values (Knuth's estimator). A path that reaches a complete
+       assignment is a solution of weight w; E[w] is the number of
+       solutions, so weighted histograms of the solutions estimate the
+       histograms bt_count would return. A path that dead-ends has weight 0.
+
+       A path through m free variables can weigh up to 2^m, more than a
+       float holds once m passes about 1000, so weights are kept as logs.
+
+       Returns (totals, mineCounts, stderr, forced):
+       totals and mineCounts are shaped like bt_count's, with float counts
+       all divided by one common factor so that they stay finite; only
+       their ratios, which is all combine_components uses, are estimated.
+       stderr[var] is the standard error of the estimate
+       sum(mineCounts[var]) / sum(totals) of var's mine probability, and
+       forced maps every variable fixed by propagation at the root to its
+       value. Only those are proven; a variable that is 0 in every sample
+       is not.
+    '''
+    bcsp = BitCSP(csp)
+    variables = bcsp.variables
+    root = bcsp.propagate(0, 0, bcsp.full)
+    if root is None:
+        return [], {v: [] for v in variables}, {v: 0.0 for v in variables}, {}
+
+    rootOnes, rootZeros = root
+    forced = {}
+    for i, v in enumerate(variables):
+        if (rootOnes | rootZeros) >> i & 1:
+            forced[v] = rootOnes >> i & 1
+
+    leaves = []  # (log weight, ones) of every path that reached a solution
+    for _ in range(samples):
+        ones, zeros = rootOnes, rootZeros
+        logWeight = 0.0
+        free = bcsp.full & ~(ones | zeros)
+        while free:
+            bit = free & -free
+            options = [state for state in (bcsp.propagate(ones | bit, zeros, bit),
+                                           bcsp.propagate(ones, zeros | bit, bit))
+                       if state is not None]
+            if not options:
+                logWeight = None
+                break
+            if len(options) == 2:
+                logWeight += LOG_2
+                ones, zeros = rng.choice(options)
+            else:
+                ones, zeros = options[0]
+            free = bcsp.full & ~(ones | zeros)
+        if logWeight is not None:
+            leaves.append((logWeight, ones))
+
+    # Log weights of the solutions with k mines, overall and per variable
+    byMines = {}
+    byVar = [{} for _ in variables]
+    for logWeight, ones in leaves:
+        k = ones.bit_count()
+        byMines.setdefault(k, []).append(logWeight)
+        bits = ones
+        while bits:
+            low = bits & -bits
+            byVar[low.bit_length() - 1].setdefault(k, []).append(logWeight)
+            bits ^= low
+
+    width = max(byMines, default=-1) + 1
+    logTotals = [log_sum_exp(byMines.get(k, [])) for k in range(width)]
+    scale = max(logTotals, default=0.0)
+    totals = [math.exp(x - scale) for x in logTotals]
+    counts = [[math.exp(log_sum_exp(logs.get(k, [])) - scale) for k in range(width)] for logs in byVar]
+
+    # Standard error of the ratio estimate p = sum(w x) / sum(w), which does
+    # not change when every weight is divided by the largest
+    top = max((logWeight for logWeight, _ in leaves), default=0.0)
+    leaves = [(math.exp(logWeight - top), ones) for logWeight, ones in leaves]
+    stderr = {}
+    weightSum = sum(weight for weight, _ in leaves)
+    for i, v in enumerate(variables):
+        if v in forced or not weightSum:
+            stderr[v] = 0.0
+            continue
+        p = sum(counts[i]) / sum(totals)
+        spread = sum((weight * ((ones >> i & 1) - p)) ** 2 for weight, ones in leaves)
+        stderr[v] = math.sqrt(spread) / weightSum
+
+    return totals, {v: counts[i] for i, v in enumerate(variables)}, stderr, forced
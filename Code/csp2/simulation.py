@@ -1,92 +1,227 @@
+import multiprocessing
+import os
+import random
+import time
+from functools import partial
+
+import numpy as np
+
 from solve_bt import *
+from Code.minesweeper import Minesweeper
+from component_cache import ComponentCache
+from Code.batch_minesweeper import BatchMinesweeper
+from Code.board_corpus import BoardCorpus
+from game_trace import GameTrace, TraceWriter
+from results_store import new_run_id, write_part
 
 def play_round(algo, row, col, mine):
     game = Minesweeper(row, col, mine)
     return algo(game)
 
-def simulate_easy_games(algo, n, bt_method, bt_heuristic, guessing_heuristic, balance_param,
-                        pause = False, print_board = False, save = False, suffix = ""):
-    print("Easy Games")
-    easy_c = 0
-    for i in range(n):
-        print(i)
-        game = Minesweeper(9, 9, 10)
-        if not save:
-            easy_c += algo(game, bt_method, bt_heuristic, guessing_heuristic, print_board=print_board)
+def play_game(i, algo, label, dims, bt_method, bt_heuristic, guessing_heuristic, balance_param,
+              seed = None, print_board = False, record = False, cache = None, corpus = None):
+    # With a seed, game i of a difficulty gets the same board and guesses in
+    # any process and in any order. The search gets a stream of its own: it
+    # draws less often when the cache is warm, which would otherwise shift
+    # every guess after it
+    game_seed = None
+    search_rng = None
+    if seed is not None:
+        game_seed = f"{seed}:{label}:{i}"
+        random.seed(game_seed)
+        search_rng = random.Random(game_seed)
+    if cache is None:
+        cache = _worker_cache
+
+    # Board i of the corpus if one is given, otherwise a fresh random board
+    first_probe = (0, 0)
+    if corpus is not None:
+        if corpus not in _corpora:
+            _corpora[corpus] = BoardCorpus(corpus)
+        game = _corpora[corpus].game(i)
+        first_probe = _corpora[corpus].first_probe(i)
+    else:
+        game = Minesweeper(*dims)
+
+    if not record:
+        return i, algo(game, bt_method, bt_heuristic, guessing_heuristic, balance_param,
+                       first_probe=first_probe, print_board=print_board, cache=cache,
+                       search_rng=search_rng), None, None
+
+    moves = []
+    start = time.time()
+    won = algo(game, bt_method, bt_heuristic, guessing_heuristic, balance_param, first_probe=first_probe,
+               print_board=print_board, cache=cache, moves=moves, search_rng=search_rng)
+    elapsed = time.time() - start
+    return i, won, elapsed, GameTrace(game.rows, game.cols, game.mine_mask(), won, game_seed, moves)
+
+def play_batch(algo, n, label, dims, bt_method, bt_heuristic, guessing_heuristic, balance_param,
+               seed = None, cache = None, corpus = None):
+    # All n games advance together while the trivial rules are enough, and
+    # only the boards where they get stuck are finished one by one by algo.
+    # Returns the wins and how many games were settled without algo
+    if seed is not None:
+        random.seed(f"{seed}:{label}:batch")
+
+    if corpus is not None:
+        with BoardCorpus(corpus) as boards:
+            batch = BatchMinesweeper.from_mines([boards.mines_of(i) for i in range(n)])
+            first_probes = np.array([boards.first_probe(i) for i in range(n)])
+        batch.probe(first_probes[:, 0], first_probes[:, 1])
+    else:
+        batch = BatchMinesweeper(n, *dims)
+        batch.probe(0, 0)
+    while batch.deduce():
+        pass
+
+    wins = int(batch.won().sum())
+    stuck = np.flatnonzero(batch.playing())
+    for i in stuck:
+        wins += algo(batch.game(i), bt_method, bt_heuristic, guessing_heuristic, balance_param,
+                     first_probe = None, cache = cache)
+    return wins, n - len(stuck)
+
+_worker_cache = None
+_corpora = {}  # corpus path -> BoardCorpus opened by this process
+
+def _init_worker(cache_path):
+    # Each worker keeps its own cache, warm-started from cache_path if given
+    global _worker_cache
+    _worker_cache = ComponentCache(path = cache_path)
+
+def _play_in_worker(i, play):
+    # What the worker's cache learned in this game goes back with the result,
+    # to be merged into the cache of the main process
+    return play(i), _worker_cache.drain()
+
+def simulate_games(algo, n, label, dims, bt_method, bt_heuristic, guessing_heuristic, balance_param,
+                   pause = False, print_board = False, save = False, suffix = "", cache = None,
+                   workers = 1, seed = None, corpus = None, results_root = "../results", batch = False):
+    if corpus is not None:
+        corpus = os.path.join(corpus, f"{label}.msbc")
+        with BoardCorpus(corpus) as boards:
+            if (boards.rows, boards.cols, boards.mines) != dims or len(boards) < n:
+                raise ValueError(f"{corpus} does not hold {n} {label} boards")
+
+    if batch:
+        # Games in a batch share one random stream and are not recorded
+        if save or workers > 1:
+            raise ValueError("batch runs are single-process and cannot be saved")
+        wins, settled = play_batch(algo, n, label, dims, bt_method, bt_heuristic, guessing_heuristic,
+                                   balance_param, seed = seed, cache = cache, corpus = corpus)
+        print(f"{settled}/{n} games settled without search")
+        return wins
+
+    game_dir = None
+    run = new_run_id()
+    if save:
+        game_dir = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/{label}"
+        os.makedirs(game_dir, exist_ok = True)
+
+    play = partial(play_game, algo = algo, label = label, dims = dims, bt_method = bt_method,
+                   bt_heuristic = bt_heuristic, guessing_heuristic = guessing_heuristic,
+                   balance_param = balance_param, seed = seed, record = save, corpus = corpus)
+
+    # Games are played in the workers, but only this process writes the summary
+    # and the trace of the run (see game_trace.py for replaying a game), in game
+    # order. Every run gets its own pair of files, named after the run like its
+    # results part, so row i of a summary is always game i of its trace
+    wins = 0
+    csv = open(f"{game_dir}/summary-{run}.csv", "w") if save else None
+    trace = TraceWriter(f"{game_dir}/trace-{run}.mst") if save else None
+    columns = {"game": [], "won": [], "time": [], "guesses": []}
+
+    def collect(result):
+        i, won, total_time, game_trace = result
+        if save:
+            csv.write(f"{'Won' if won else 'Lost'}, {total_time}, {game_trace.guesses()}\n")
+            trace.add_game(game_trace)
+            for name, value in zip(columns, (i, won, total_time, game_trace.guesses())):
+                columns[name].append(value)
+        return won
+
+    try:
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer = _init_worker,
+                                      initargs = (cache.path if cache is not None else None,)) as pool:
+                for result, learned in pool.imap(partial(_play_in_worker, play = play), range(n)):
+                    if cache is not None:
+                        cache.merge(*learned)
+                    wins += collect(result)
         else:
-            csv_file = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/easy/summary.csv"
-            txt_file = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/easy/games/game_{i}.txt"
-            easy_c += algo(game, bt_method, bt_heuristic, guessing_heuristic, balance_param,
-                           print_board=print_board, files=(csv_file, txt_file))
+            for i in range(n):
+                wins += collect(play(i, print_board = print_board, cache = cache))
+                if pause:
+                    input()
+    finally:
+        if save:
+            csv.close()
+            trace.close()
+
+    if save:
+        # method is named like the games directory, e.g. GAC_mrv
+        write_part(results_root, f"{bt_method}_{bt_heuristic}", guessing_heuristic, label, balance_param,
+                   run = run, **columns)
+
+    return wins
 
-        if pause:
-            input()
-
-    return easy_c
+def simulate_easy_games(algo, n, bt_method, bt_heuristic, guessing_heuristic, balance_param,
+                        pause = False, print_board = False, save = False, suffix = "", cache = None,
+                        workers = 1, seed = None, corpus = None, batch = False):
+    print("Easy Games")
+    return simulate_games(algo, n, "easy", (9, 9, 10), bt_method, bt_heuristic, guessing_heuristic,
+                          balance_param, pause, print_board, save, suffix, cache, workers, seed, corpus,
+                          batch)
 
 def simulate_interm_games(algo, n, bt_method, bt_heuristic, guessing_heuristic, balance_param,
-                          pause = False, print_board = False, save = False, suffix = ""):
+                          pause = False, print_board = False, save = False, suffix = "", cache = None,
+                          workers = 1, seed = None, corpus = None, batch = False):
     print("Intermediate Games")
-    interm_c = 0
-    for i in range(n):
-        print(i)
-        game = Minesweeper(16, 16, 40)
-        if not save:
-            interm_c += algo(game, bt_method, bt_heuristic, guessing_heuristic, print_board=print_board)
-        else:
-            csv_file = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/interm/summary.csv"
-            txt_file = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/interm/games/game_{i}.txt"
-            interm_c += algo(game, bt_method, bt_heuristic, guessing_heuristic, balance_param,
-                             print_board=print_board, files=(csv_file, txt_file))
-
-        if pause:
-            input()
-
-    return interm_c
+    return simulate_games(algo, n, "interm", (16, 16, 40), bt_method, bt_heuristic, guessing_heuristic,
+                          balance_param, pause, print_board, save, suffix, cache, workers, seed, corpus,
+                          batch)
 
 def simulate_expert_games(algo, n, bt_method, bt_heuristic, guessing_heuristic, balance_param,
-                          pause = False, print_board = False, save = False, suffix = ""):
+                          pause = False, print_board = False, save = False, suffix = "", cache = None,
+                          workers = 1, seed = None, corpus = None, batch = False):
     print("Expert Games")
-    expert_c = 0
-    for i in range(n):
-        print(i)
-        game = Minesweeper(16, 30, 99)
-        if not save:
-            expert_c += algo(game, bt_method, bt_heuristic, guessing_heuristic,print_board=print_board)
-        else:
-            csv_file = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/expert/summary.csv"
-            txt_file = f"../games/{bt_method}_{bt_heuristic}_{guessing_heuristic}_{suffix}/expert/games/game_{i}.txt"
-            expert_c += algo(game, bt_method, bt_heuristic, guessing_heuristic, balance_param,
-                             print_board=print_board, files=(csv_file, txt_file))
-
-        if pause:
-            input()
-
-    return expert_c
+    return simulate_games(algo, n, "expert", (16, 30, 99), bt_method, bt_heuristic, guessing_heuristic,
+                          balance_param, pause, print_board, save, suffix, cache, workers, seed, corpus,
+                          batch)
 
 def simulate_rounds(algo, n, bt_method, bt_heuristic, guessing_heuristic, balance_param = 1.0,
                     pause = False, print_board = False, save = False,
-                    easy = True, interm = True, expert = True, suffix = ""):
+                    easy = True, interm = True, expert = True, suffix = "", cache_path = None,
+                    workers = 1, seed = None, corpus = None, batch = False):
     if guessing_heuristic == "balanced" and (balance_param < 0 or balance_param > 1):
         return
 
+    # Component counts are shared by every game and, with cache_path, by every run
+    cache = ComponentCache(path = cache_path)
+
     if easy:
         easy_c = simulate_easy_games(algo = algo, n = n, pause = pause, print_board = print_board,
                                      save = save, bt_method = bt_method, bt_heuristic = bt_heuristic,
                                      guessing_heuristic = guessing_heuristic, balance_param = balance_param,
-                                     suffix = suffix)
+                                     suffix = suffix, cache = cache, workers = workers, seed = seed,
+                                     corpus = corpus, batch = batch)
 
     if interm:
         interm_c = simulate_interm_games(algo = algo, n = n, pause = pause, print_board = print_board,
                                          save = save, bt_method = bt_method, bt_heuristic = bt_heuristic,
                                          guessing_heuristic = guessing_heuristic, balance_param = balance_param,
-                                         suffix = suffix)
+                                         suffix = suffix, cache = cache, workers = workers, seed = seed,
+                                         corpus = corpus, batch = batch)
 
     if expert:
         expert_c = simulate_expert_games(algo = algo, n = n, pause = pause, print_board = print_board,
                                          save = save, bt_method = bt_method, bt_heuristic = bt_heuristic,
                                          guessing_heuristic = guessing_heuristic, balance_param = balance_param,
-                                         suffix = suffix)
+                                         suffix = suffix, cache = cache, workers = workers, seed = seed,
+                                         corpus = corpus, batch = batch)
+
+    cache.save()
+    print(f"Component cache: {cache.stats()}")
 
     if easy:
         print(f"Easy Difficulty - Win Rate:{easy_c / n}")
@@ -98,10 +233,11 @@ def simulate_rounds(algo, n, bt_method, bt_heuristic, guessing_heuristic, balanc
         print(f"Expert Difficulty - Win Rate:{expert_c / n}")
 
 if __name__ == "__main__":
-    # bt_method = "BT", "FC", "GAC"
+    # bt_method = "BT", "FC", "GAC", "BIT"
     # bt_heuristic = "random", "mrv"
     # guessing_heuristic = "random", "safest", "frontier", "frontier_balanced", "frontier_relative_balanced"
-    #                      "useful_relative_balanced"
+    #                      "useful_relative_balanced", "most_useful", "useful_more_than_k"
+    # useful_more_than_k takes its k from solve_bt, e.g. simulate_rounds(partial(solve_bt, k = 2), ...)
     num_rounds = 1000
     balance_param = 1
     simulate_rounds(solve_bt,
@@ -1,13 +1,14 @@
 import os
 import random
-from bitarray import bitarray
 
-from Code.minesweeper import Minesweeper
-from constraints import MSConstraint
 from csp_modelling import Variable, CSP
-from backtracking import bt_search
+from backtracking import bt_count, SearchContext
+from probability import combine_components, estimate_component
+from constraint_store import ConstraintStore
+from deduction import deduce
+from sampler import sample_count
+from game_trace import PROBE, FLAG, FIRST, DEDUCED, FORCED, GUESSED
 import time
-from collections import deque, defaultdict
 
 def list_unrevealed_unflagged(game):
     rows, cols = game.rows, game.cols
@@ -29,13 +30,113 @@ def pick_corner_edge_or_random(cells, rows, cols):
         return random.choice(edges)
     return random.choice(cells)
 
+class VariableTable(dict):
+    '''
+    (r, c) -> Variable of that cell, created the first time the cell is
+    looked up, so only cells that reach the frontier get a Variable.
+    cells maps every Variable created back to its (r, c).
+    '''
+    def __init__(self, cols):
+        super().__init__()
+        self.cols = cols
+        self.cells = {}
+
+    def __missing__(self, cell):
+        v = self[cell] = Variable(str(cell[0] * self.cols + cell[1]), [0, 1])
+        self.cells[v] = cell
+        return v
+
+class HiddenCells:
+    '''
+    The unrevealed, unflagged cells of a game that are not in exclude, as
+    the guess heuristics use them: len(), pick() (a corner, else an edge,
+    else any cell, like pick_corner_edge_or_random), pick_kind() (pick()
+    and which of the three it was) and choice() (uniform).
+
+    On an ordinary board the cells are listed by scanning the board and
+    picks are made exactly as before. On a board with sparse = True
+    (SparseMinesweeper) nothing is listed: the count comes from the
+    game's counters, corners and edges are checked directly and other
+    cells are found by rejection sampling.
+    '''
+    TRIES = 64  # random cells tried before falling back to a scan
+
+    def __init__(self, game, exclude=frozenset()):
+        self.game = game
+        self.exclude = exclude
+        self.cells = None
+        if not getattr(game, "sparse", False):
+            self.cells = [cell for cell in list_unrevealed_unflagged(game) if cell not in exclude]
+
+    def without(self, exclude):
+        if self.cells is None:
+            return HiddenCells(self.game, exclude)
+        pool = HiddenCells.__new__(HiddenCells)
+        pool.game, pool.exclude = self.game, exclude
+        pool.cells = [cell for cell in self.cells if cell not in exclude]
+        return pool
+
+    def _ok(self, cell):
+        r, c = cell
+        game = self.game
+        return not game.revealed[r][c] and not game.flagged[r][c] and cell not in self.exclude
+
+    def __len__(self):
+        if self.cells is not None:
+            return len(self.cells)
+        game = self.game
+        excluded = sum(1 for r, c in self.exclude if not game.revealed[r][c] and not game.flagged[r][c])
+        return game.hidden_unflagged() - excluded
+
+    def _sample(self, accept):
+        rows, cols = self.game.rows, self.game.cols
+        for _ in range(self.TRIES):
+            cell = (random.randrange(rows), random.randrange(cols))
+            if accept(cell):
+                return cell
+        cells = [cell for cell in list_unrevealed_unflagged(self.game) if accept(cell)]
+        return random.choice(cells) if cells else None
+
+    def choice(self):
+        if self.cells is not None:
+            return random.choice(self.cells)
+        return self._sample(self._ok)
+
+    def pick_kind(self):
+        if self.cells is not None:
+            if not self.cells:
+                return None, None
+            rows, cols = self.game.rows, self.game.cols
+            corners = [c for c in corner_cells(rows, cols) if c in self.cells]
+            if corners:
+                return random.choice(corners), "corner"
+            edges = [(r, c) for (r, c) in self.cells if r in (0, rows - 1) or c in (0, cols - 1)]
+            if edges:
+                return random.choice(edges), "edge"
+            return random.choice(self.cells), "inner"
+
+        if not len(self):
+            return None, None
+        rows, cols = self.game.rows, self.game.cols
+        corners = [c for c in corner_cells(rows, cols) if self._ok(c)]
+        if corners:
+            return random.choice(corners), "corner"
+        border = [(r, c) for r in sorted({0, rows - 1}) for c in range(cols)]
+        border += [(r, c) for r in range(1, rows - 1) for c in sorted({0, cols - 1})]
+        edges = [cell for cell in border if self._ok(cell)]
+        if edges:
+            return random.choice(edges), "edge"
+        return self._sample(self._ok), "inner"
+
+    def pick(self):
+        return self.pick_kind()[0]
+
 def random_guess(game):
-    choices = list_unrevealed_unflagged(game)
-    return random.choice(choices)
+    return HiddenCells(game).choice()
 
-def safest_guess(game, prob_map, total_mines):
-    rows, cols = game.rows, game.cols
-    unrevealed = list_unrevealed_unflagged(game)
+def safest_guess(game, prob_map, total_mines, p_uncon=None):
+    cols = game.cols
+    unrevealed = HiddenCells(game)
     if not unrevealed:
         return None
 
@@ -51,31 +152,31 @@ def safest_guess(game, prob_map, total_mines):
             constrained_set.add((r,c))
 
     # Remaining mines (estimate)
-    flagged_count = sum(game.flagged[r][c] for r in range(rows) for c in range(cols))
-    estimated_mines_left = total_mines - flagged_count - constrained_expected
+    estimated_mines_left = total_mines - game.flags_placed - constrained_expected
     if estimated_mines_left < 0:
         estimated_mines_left = 0  
 
-    unconstrained_cells = [cell for cell in unrevealed if cell not in constrained_set]
-    if unconstrained_cells:
-        p_uncon = estimated_mines_left / len(unconstrained_cells)
+    unconstrained_cells = unrevealed.without(constrained_set)
+    if p_uncon is None:
+        if unconstrained_cells:
+            p_uncon = estimated_mines_left / len(unconstrained_cells)
 
-    # No unconstrained available
-    else:
-        p_uncon = 1.0  
+        # No unconstrained available
+        else:
+            p_uncon = 1.0  
 
     if constrained:
         best_con, p_con = min(constrained, key=lambda x: x[1])
         
         if unconstrained_cells and p_uncon < p_con:
-            return pick_corner_edge_or_random(unconstrained_cells, rows, cols)
+            return unconstrained_cells.pick()
         else:
             return best_con
     else:
-        return pick_corner_edge_or_random(unrevealed, rows, cols)
+        return unrevealed.pick()
 
 def frontier_guess(game, prob_map):
-    rows, cols = game.rows, game.cols
+    cols = game.cols
 
     constrained = []
     for v, p in prob_map.items():
@@ -86,11 +187,11 @@ def frontier_guess(game, prob_map):
         (cell, _p) = min(constrained, key=lambda x: x[1])
         return cell
 
-    return pick_corner_edge_or_random(list_unrevealed_unflagged(game), rows, cols)
+    return HiddenCells(game).pick()
 
-def frontier_balanced_guess(game, prob_map, total_mines, balance_param):
-    rows, cols = game.rows, game.cols
-    unrevealed = list_unrevealed_unflagged(game)
+def frontier_balanced_guess(game, prob_map, total_mines, balance_param, p_uncon=None):
+    cols = game.cols
+    unrevealed = HiddenCells(game)
     if not unrevealed:
         return None
 
@@ -104,16 +205,16 @@ def frontier_balanced_guess(game, prob_map, total_mines, balance_param):
             constrained_expected += p
             constrained_set.add((r,c))
 
-    flagged_count = sum(game.flagged[r][c] for r in range(rows) for c in range(cols))
-    estimated_mines_left = total_mines - flagged_count - constrained_expected
+    estimated_mines_left = total_mines - game.flags_placed - constrained_expected
     if estimated_mines_left < 0:
         estimated_mines_left = 0
 
-    unconstrained_cells = [cell for cell in unrevealed if cell not in constrained_set]
-    if unconstrained_cells:
-        p_uncon = estimated_mines_left / len(unconstrained_cells)
-    else:
-        p_uncon = 1.0
+    unconstrained_cells = unrevealed.without(constrained_set)
+    if p_uncon is None:
+        if unconstrained_cells:
+            p_uncon = estimated_mines_left / len(unconstrained_cells)
+        else:
+            p_uncon = 1.0
 
     if constrained:
         best_con, p_con = min(constrained, key=lambda x: x[1])
@@ -122,14 +223,14 @@ def frontier_balanced_guess(game, prob_map, total_mines, balance_param):
             return best_con
 
         if unconstrained_cells and p_uncon < p_con:
-            return pick_corner_edge_or_random(unconstrained_cells, rows, cols)
+            return unconstrained_cells.pick()
         return best_con
     else:
-        return pick_corner_edge_or_random(unrevealed, rows, cols)
+        return unrevealed.pick()
 
-def frontier_relative_balanced_guess(game, prob_map, total_mines, balance_param):
-    rows, cols = game.rows, game.cols
-    unrevealed = list_unrevealed_unflagged(game)
+def frontier_relative_balanced_guess(game, prob_map, total_mines, balance_param, p_uncon=None):
+    cols = game.cols
+    unrevealed = HiddenCells(game)
     if not unrevealed:
         return None
 
@@ -143,16 +244,16 @@ def frontier_relative_balanced_guess(game, prob_map, total_mines, balance_param)
             constrained_expected += p
             constrained_set.add((r,c))
 
-    flagged_count = sum(game.flagged[r][c] for r in range(rows) for c in range(cols))
-    estimated_mines_left = total_mines - flagged_count - constrained_expected
+    estimated_mines_left = total_mines - game.flags_placed - constrained_expected
     if estimated_mines_left < 0:
         estimated_mines_left = 0
 
-    unconstrained_cells = [cell for cell in unrevealed if cell not in constrained_set]
-    if unconstrained_cells:
-        p_uncon = estimated_mines_left / len(unconstrained_cells)
-    else:
-        p_uncon = 1.0
+    unconstrained_cells = unrevealed.without(constrained_set)
+    if p_uncon is None:
+        if unconstrained_cells:
+            p_uncon = estimated_mines_left / len(unconstrained_cells)
+        else:
+            p_uncon = 1.0
 
     if constrained:
         best_con, p_con = min(constrained, key=lambda x: x[1])
@@ -161,14 +262,14 @@ def frontier_relative_balanced_guess(game, prob_map, total_mines, balance_param)
             return best_con
 
         if unconstrained_cells and p_uncon < p_con:
-            return pick_corner_edge_or_random(unconstrained_cells, rows, cols)
+            return unconstrained_cells.pick()
         return best_con
     else:
-        return pick_corner_edge_or_random(unrevealed, rows, cols)
+        return unrevealed.pick()
 
-def useful_relative_balanced_guess(game, prob_map, total_mines, constraints_list, balance_param):
-    rows, cols = game.rows, game.cols
-    unrevealed = list_unrevealed_unflagged(game)
+def useful_relative_balanced_guess(game, prob_map, total_mines, constraints_list, balance_param, p_uncon=None):
+    cols = game.cols
+    unrevealed = HiddenCells(game)
 
     useful_vars = set()
 
@@ -188,16 +289,16 @@ def useful_relative_balanced_guess(game, prob_map, total_mines, constraints_list
             if v in useful_vars:
                 useful_constrained.append(((r, c), p))
 
-    flagged_count = sum(game.flagged[r][c] for r in range(rows) for c in range(cols))
-    estimated_mines_left = total_mines - flagged_count - constrained_expected
+    estimated_mines_left = total_mines - game.flags_placed - constrained_expected
     if estimated_mines_left < 0:
         estimated_mines_left = 0
 
-    unconstrained_cells = [cell for cell in unrevealed if cell not in constrained_set]
-    if unconstrained_cells:
-        p_uncon = estimated_mines_left / len(unconstrained_cells)
-    else:
-        p_uncon = 1.0
+    unconstrained_cells = unrevealed.without(constrained_set)
+    if p_uncon is None:
+        if unconstrained_cells:
+            p_uncon = estimated_mines_left / len(unconstrained_cells)
+        else:
+            p_uncon = 1.0
 
     if useful_constrained:
         best_con, p_con = min(useful_constrained, key=lambda x: x[1])
@@ -206,38 +307,26 @@ def useful_relative_balanced_guess(game, prob_map, total_mines, constraints_list
             return best_con
 
         if unconstrained_cells and p_uncon < p_con:
-            return pick_corner_edge_or_random(unconstrained_cells, rows, cols)
+            return unconstrained_cells.pick()
 
         return best_con
 
     else:
-        return pick_corner_edge_or_random(unrevealed, rows, cols)
+        return unrevealed.pick()
 
-def most_useful_guess(game, prob_map, total_mines, constraints_list):
-    def best_pick_with_prob_zero_before_mine(cells, rows, cols, p_uncon):
-        if not cells:
+def most_useful_guess(game, prob_map, total_mines, constraints_list, p_uncon=None):
+    def best_pick_with_prob_zero_before_mine(cells, p_uncon):
+        cell, kind = cells.pick_kind()
+        if cell is None:
             return None, -1
 
-        corners = [c for c in corner_cells(rows, cols) if c in cells]
-        if corners:
-            p_zero = (1 - p_uncon) ** 4
-            p_zero_before_mine = p_zero / (p_zero + p_uncon)
-            return random.choice(corners), p_zero_before_mine
-
-        edges = [(r, c) for (r, c) in cells
-                if r in (0, rows - 1) or c in (0, cols - 1)]
-        if edges:
-            p_zero = (1 - p_uncon) ** 6
-            p_zero_before_mine = p_zero / (p_zero + p_uncon)
-            return random.choice(edges), p_zero_before_mine
-
-        else:
-            p_zero = (1 - p_uncon) ** 9
-            p_zero_before_mine = p_zero / (p_zero + p_uncon)
-            return random.choice(cells), p_zero_before_mine
+        # A corner has 3 neighbours, an edge cell 5 and an inner cell 8
+        p_zero = (1 - p_uncon) ** {"corner": 4, "edge": 6, "inner": 9}[kind]
+        p_zero_before_mine = p_zero / (p_zero + p_uncon)
+        return cell, p_zero_before_mine
 
-    rows, cols = game.rows, game.cols
-    unrevealed = list_unrevealed_unflagged(game)
+    cols = game.cols
+    unrevealed = HiddenCells(game)
 
     useful_vars = set()
 
@@ -257,20 +346,20 @@ def most_useful_guess(game, prob_map, total_mines, constraints_list):
             if v in useful_vars:
                 useful_constrained.append(((r, c), p))
 
-    flagged_count = sum(game.flagged[r][c] for r in range(rows) for c in range(cols))
-    estimated_mines_left = total_mines - flagged_count - constrained_expected
+    estimated_mines_left = total_mines - game.flags_placed - constrained_expected
     if estimated_mines_left < 0:
         estimated_mines_left = 0
 
-    unconstrained_cells = [cell for cell in unrevealed if cell not in constrained_set]
+    unconstrained_cells = unrevealed.without(constrained_set)
 
-    if unconstrained_cells:
-        p_uncon = estimated_mines_left / len(unconstrained_cells)
-    else:
-        p_uncon = 1.0
+    if p_uncon is None:
+        if unconstrained_cells:
+            p_uncon = estimated_mines_left / len(unconstrained_cells)
+        else:
+            p_uncon = 1.0
 
     cell_free, p_zero_before_mine = best_pick_with_prob_zero_before_mine(
-        unconstrained_cells, rows, cols, p_uncon
+        unconstrained_cells, p_uncon
     )
 
     if useful_constrained:
@@ -282,133 +371,101 @@ def most_useful_guess(game, prob_map, total_mines, constraints_list):
         return best_con
 
     else:
-        return pick_corner_edge_or_random(unrevealed, rows, cols)
-
-def useful_more_than_k_guess(game, prob_map, total_mines, constraints_list, k):
-    rows, cols = game.rows, game.cols
-    unrevealed = list_unrevealed_unflagged(game)
-
-    useful_cons_vars = set()
-
-    for cons in constraints_list:
+        return unrevealed.pick()
+
+def useful_more_than_k_guess(game, prob_map, total_mines, store, k, p_uncon=None):
+    '''
+    Safest useful frontier cell whose probe would settle more than k other
+    cells if it is safe, else safest_guess.
+
+    A cell is useful when its constraint needs all of its other cells to be
+    mines. For each one, deduce() runs on the constraints of its component
+    of store (the solver's ConstraintStore) as they would be with those
+    cells flagged, so neither the game nor the store is changed.
+    '''
+    cols = game.cols
+
+    # Useful cells and the other cells of the constraint that makes them
+    # useful, in a fixed order so seeded games stay reproducible
+    useful = {}
+    for cons in store.constraints():
         if cons.get_target() == len(cons.scope()) - 1:
             for var in cons.scope():
-                useful_cons_vars.add((cons, var))
-
-    for cons, var in useful_cons_vars:
-        game_copy = game.copy()
-
-        other_vars = set(cons.scope())
-        other_vars.remove(var)
-
-        game.toggle_flag()
-
+                useful.setdefault(var, [v for v in cons.scope() if v is not var])
 
+    # Flags only reach the constraints of their own component
+    component_of = {}
+    for comp_vars, comp_constraints in store.components():
+        for v in comp_vars:
+            component_of[v] = comp_constraints
 
+    candidates = []
+    for var, others in useful.items():
+        flags = [divmod(int(v.name()), cols) for v in others]
+        safe_vars, mine_vars = deduce(store.constraints_if_flagged(flags, component_of[var]))
 
+        # The cell itself is among the safe cells
+        if len(safe_vars) + len(mine_vars) - 1 > k:
+            candidates.append((divmod(int(var.name()), cols), prob_map.get(var, 1.0)))
 
+    if candidates:
+        return min(candidates, key=lambda x: x[1])[0]
+    return safest_guess(game, prob_map, total_mines, p_uncon)
 
 def solve_bt(game, bt_method, bt_heuristic, guessing_heuristic,
              balance_param=1.0, first_probe=(0, 0),
-             print_board=False, files=None):
-
-    def add_constraint_for_cell(i, j):
-        n = game.get_cell_number(i, j)
-        if n is None or n == game.MINE:
-            return
-        flagged = 0
-        covered = []
-        for dr in (-1, 0, 1):
-            for dc in (-1, 0, 1):
-                if dr == 0 and dc == 0: continue
-                rr, cc = i + dr, j + dc
-                if 0 <= rr < rows and 0 <= cc < cols:
-                    if game.flagged[rr][cc]:
-                        flagged += 1
-                    elif not game.revealed[rr][cc]:
-                        covered.append(index_to_var[(rr, cc)])
-        target = n - flagged
-        if covered:
-            constraints_list.append(MSConstraint(f"cell_{i}_{j}", covered, target))
-
-    def rebuild_constraints(constraints_list):
-        constraints_list.clear()
-        for i in range(rows):
-            for j in range(cols):
-                if game.revealed[i][j]:
-                    add_constraint_for_cell(i, j)
-
-
-    def compute_components(constraints, index_to_var, var_to_index):
-        adj = defaultdict(set)
-        frontier_vars = set()
-        for c in constraints:
-            scope = c.scope()
-            frontier_vars.update(scope)
-
-            for i in range(len(scope)):
-                for j in range(i + 1, len(scope)):
-                    v1, v2 = scope[i], scope[j]
-                    adj[v1].add(v2)
-                    adj[v2].add(v1)
-
-        comps = []
-        seen = set()
-        for v in frontier_vars:
-            if v in seen:
-                continue
-            q = deque([v])
-            seen.add(v)
-            comp = []
-            while q:
-                cur = q.popleft()
-                comp.append(cur)
-                for nb in adj[cur]:
-                    if nb not in seen:
-                        seen.add(nb)
-                        q.append(nb)
-            comps.append(comp)
-        return comps
-
-
-    def constraints_for_component(comp_vars, constraints):
-        comp_set = set(comp_vars)
-        return [c for c in constraints if all(v in comp_set for v in c.scope())]
-
-    if bt_method not in {"BT", "FC", "GAC"}:
-        raise ValueError("bt_method must be one of BT, FC, GAC")
+             print_board=False, files=None, cache=None, stats=None, moves=None,
+             deadline=None, node_budget=None, sample_above=200, samples=2000, search_rng=None, k=None):
+
+    if bt_method not in {"BT", "FC", "GAC", "BIT"}:
+        raise ValueError("bt_method must be one of BT, FC, GAC, BIT")
     if bt_heuristic not in {"random", "mrv"}:
         raise ValueError("bt_heuristic must be one of random, mrv")
     if guessing_heuristic not in {"random", "safest", "frontier", "frontier_balanced",
                                   "frontier_relative_balanced", "useful_relative_balanced",
-                                  "most_useful"}:
+                                  "most_useful", "useful_more_than_k"}:
         raise ValueError("guessing_heuristic invalid")
     if guessing_heuristic in {"balanced", "relative_balanced"} and not (0.0 <= balance_param <= 1.0):
         raise ValueError("balance_param out of range")
+    if guessing_heuristic == "useful_more_than_k" and (type(k) is not int or k < 0):
+        raise ValueError("useful_more_than_k needs k, a non-negative int")
 
-    rows, cols = game.rows, game.cols
+    cols = game.cols
     mines = game.total_mines
 
-    index_to_var = {}
-    var_to_index = {}
-    for r in range(rows):
-        for c in range(cols):
-            v = Variable(str(r * cols + c), [0, 1])
-            index_to_var[(r, c)] = v
-            var_to_index[v] = (r, c)
+    # Variables are made the first time a cell is asked for, so a huge
+    # board only pays for the cells near the revealed area
+    index_to_var = VariableTable(cols)
+    var_to_index = index_to_var.cells
 
-    constraints_list = []
+    # Sampled components are never cached, so the sampler draws from a stream
+    # split off search_rng before any search can, which the cache cannot shift
+    sample_rng = random if search_rng is None else random.Random(search_rng.getrandbits(64))
 
-    game.probe(*first_probe)
+    store = ConstraintStore(game, index_to_var)
+    if first_probe is None:
+        # A game that is already under way, e.g. one handed over by BatchMinesweeper
+        store.rebuild()
+    else:
+        store.reveal(game.probe(*first_probe))
+        # moves, if given, receives every (action, source, r, c) for game_trace
+        if moves is not None:
+            moves.append((PROBE, FIRST) + tuple(first_probe))
+
+    # Turns settled by deduce() alone vs. turns that needed the search, and
+    # guesses made; stats, if given, gets the same from its TurnRecords
+    deduced_turns = 0
+    search_turns = 0
+    num_guesses = 0
+    if stats is not None:
+        stats.start_game(game)
 
     # File logging init (unchanged skeleton)
     if files:
         init_time = time.time()
-        prev_time = init_time
-        curr_time = init_time
+        cur_time = init_time
         os.makedirs(os.path.dirname(files[0]), exist_ok=True)
         os.makedirs(os.path.dirname(files[1]), exist_ok=True)
-        num_guesses = 0
         csv = open(files[0], "a")
         txt = open(files[1], "w", encoding="utf-8")
         txt.write("\n\n")
@@ -418,96 +475,183 @@ def solve_bt(game, bt_method, bt_heuristic, guessing_heuristic,
         if print_board:
             print(game.get_board_str(), "\n")
         if files:
-            prev_time = curr_time
+            prev_time = cur_time
             cur_time = time.time()
             txt.write(game.get_board_str() + "\n")
             txt.write(f"Took: {cur_time - prev_time} seconds\n\n")
 
-        rebuild_constraints(constraints_list)
-
         # Terminal checks
-        if game.game_over:
+        if game.game_over or game.check_win():
+            won = not game.game_over
+            if stats is not None:
+                stats.end_game(won)
             if files:
+                result = "Won" if won else "Lost"
                 txt.seek(0)
-                txt.write("Lost\n")
-                txt.write(f"Total Time: {cur_time - init_time} seconds\n\n")
-                csv.write(f"Lost, {cur_time - init_time}, {num_guesses}\n")
+                txt.write(f"{result}\n")
+                txt.write(f"Total Time: {cur_time - init_time} seconds\n")
+                txt.write(f"Turns without search: {deduced_turns}/{deduced_turns + search_turns}\n\n")
+                csv.write(f"{result}, {cur_time - init_time}, {num_guesses}\n")
                 csv.close()
                 txt.close()
-            return False
-        if game.check_win():
-            if files:
-                txt.seek(0)
-                txt.write("Won\n")
-                txt.write(f"Total Time: {cur_time - init_time} seconds\n\n")
-                csv.write(f"Won, {cur_time - init_time}, {num_guesses}\n")
-                csv.close()
-                txt.close()
-            return True
+            return won
+
+        rec = stats.start_turn() if stats is not None else None
+        constraints_list = store.constraints()
+        if rec:
+            rec.constraints = len(constraints_list)
+            rec.lap("constraints")
+
+        # Trivial and subset rules first; search only when they are stuck
+        safe_vars, mine_vars = deduce(constraints_list)
+        if rec:
+            rec.lap("deduction")
+        if safe_vars or mine_vars:
+            deduced_turns += 1
+            for (r, c) in sorted(var_to_index[v] for v in mine_vars):
+                if not game.flagged[r][c]:
+                    game.toggle_flag(r, c)
+                    store.flag([(r, c)])
+                    if moves is not None:
+                        moves.append((FLAG, DEDUCED, r, c))
+            for (r, c) in sorted(var_to_index[v] for v in safe_vars):
+                if (not game.revealed[r][c]) and (not game.flagged[r][c]):
+                    store.reveal(game.probe(r, c))
+                    if moves is not None:
+                        moves.append((PROBE, DEDUCED, r, c))
+            if rec:
+                rec.kind = "deduction"
+                rec.lap("apply")
+                stats.end_turn(rec)
+            continue
 
-        components = compute_components(constraints_list, index_to_var, var_to_index)
+        search_turns += 1
+        components = store.components()
+        if rec:
+            rec.components = [len(comp_vars) for comp_vars, _ in components]
+            rec.lap("components")
 
         forced_safe = set()
         forced_mine = set()
         prob_map = {}
+        counted = []
+
+        for comp_idx, (comp_vars, comp_constraints) in enumerate(components):
+            if sample_above is not None and len(comp_vars) > sample_above:
+                csp = CSP(f"Comp_{comp_idx}", comp_vars, comp_constraints)
+                totals, mine_counts, _, forced = sample_count(csp, samples, sample_rng)
+                if sum(totals) > 0:
+                    if rec:
+                        rec.sampled += 1
+                        rec.nodes.append(0)
+                    counted.append((totals, mine_counts))
+                    # Only cells fixed by propagation are certain
+                    for v in comp_vars:
+                        if v in forced:
+                            (forced_mine if forced[v] else forced_safe).add(var_to_index[v])
+                        prob_map[v] = sum(mine_counts[v]) / sum(totals)
+                    continue
+
+            # The search draws from search_rng, if given, and not from the
+            # random module, so whether a count comes from the cache does not
+            # change the guesses that follow
+            search = SearchContext(search_rng)
+
+            def count():
+                csp = CSP(f"Comp_{comp_idx}", comp_vars, comp_constraints)
+                result = bt_count(csp=csp, algo=bt_method, variableHeuristic=bt_heuristic,
+                                  deadline=deadline, nodeBudget=node_budget, context=search)
+                return None if search.approximate else result
+
+            if cache is not None:
+                result = cache.lookup(comp_vars, comp_constraints, cols, count)
+            else:
+                result = count()
+            if rec:
+                rec.nodes.append(search.nodesExplored)
+
+            if result is None:
+                # Out of budget: estimate this component, and force nothing from it
+                if rec:
+                    rec.approximate += 1
+                totals, mine_counts = estimate_component(comp_vars, comp_constraints)
+                counted.append((totals, mine_counts))
+                for v in comp_vars:
+                    prob_map[v] = sum(mine_counts[v])
+                continue
 
-        for comp_idx, comp_vars in enumerate(components):
-            comp_constraints = constraints_for_component(comp_vars, constraints_list)
-
-            local_mine_counts = {v: 0 for v in comp_vars}
-            local_total = 0
-
-            def acc(sol):
-                nonlocal local_total
-                local_total += 1
-                for v, val in sol:
-                    if val == 1:
-                        local_mine_counts[v] += 1
-
-            csp = CSP(f"Comp_{comp_idx}", comp_vars, comp_constraints)
-
-            bt_search(csp=csp, algo=bt_method, variableHeuristic=bt_heuristic,
-                      allSolutions=True, trace=False, track_sol=acc)
+            totals, mine_counts = result
+            local_total = sum(totals)
+            counted.append((totals, mine_counts))
 
             for v in comp_vars:
-                m = local_mine_counts[v]
+                m = sum(mine_counts[v])
                 if m == 0:
                     forced_safe.add(var_to_index[v])
                 elif m == local_total:
                     forced_mine.add(var_to_index[v])
                 prob_map[v] = m / local_total
+        if rec:
+            rec.lap("search")
 
         if forced_mine or forced_safe:
             for (r, c) in forced_mine:
                 if not game.flagged[r][c]:
                     game.toggle_flag(r, c)
+                    store.flag([(r, c)])
+                    if moves is not None:
+                        moves.append((FLAG, FORCED, r, c))
             for (r, c) in forced_safe:
                 if (not game.revealed[r][c]) and (not game.flagged[r][c]):
-                    newly = game.probe(r, c) or set()
-                    for (i, j) in newly:
-                        add_constraint_for_cell(i, j)
+                    store.reveal(game.probe(r, c))
+                    if moves is not None:
+                        moves.append((PROBE, FORCED, r, c))
+            if rec:
+                rec.kind = "forced"
+                rec.lap("apply")
+                stats.end_turn(rec)
             continue
 
+        # No forced moves: weigh the components against each other and the
+        # unconstrained cells using the total number of mines
+        frontier_size = sum(len(comp_vars) for comp_vars, _ in components)
+        unconstrained = game.hidden_unflagged() - frontier_size
+        global_prob, p_uncon = combine_components(counted, unconstrained, game.mines_remaining())
+        if global_prob is not None:
+            prob_map = global_prob
+        if rec:
+            rec.lap("combine")
+
         if guessing_heuristic == "random":
             r, c = random_guess(game)
         elif guessing_heuristic == "frontier":
             r, c = frontier_guess(game, prob_map)
         elif guessing_heuristic == "safest":
-            r, c = safest_guess(game, prob_map, mines)
+            r, c = safest_guess(game, prob_map, mines, p_uncon)
         elif guessing_heuristic == "frontier_balanced":
-            r, c = frontier_balanced_guess(game, prob_map, mines, balance_param)
+            r, c = frontier_balanced_guess(game, prob_map, mines, balance_param, p_uncon)
         elif guessing_heuristic == "frontier_relative_balanced":
-            r, c = frontier_relative_balanced_guess(game, prob_map, mines, balance_param)
+            r, c = frontier_relative_balanced_guess(game, prob_map, mines, balance_param, p_uncon)
         elif guessing_heuristic == "useful_relative_balanced":
-            r, c = useful_relative_balanced_guess(game, prob_map, mines, constraints_list, balance_param)
+            r, c = useful_relative_balanced_guess(game, prob_map, mines, constraints_list, balance_param,
+                                                  p_uncon)
         elif guessing_heuristic == "most_useful":
-            r, c = most_useful_guess(game, prob_map, mines, constraints_list)
+            r, c = most_useful_guess(game, prob_map, mines, constraints_list, p_uncon)
+        elif guessing_heuristic == "useful_more_than_k":
+            r, c = useful_more_than_k_guess(game, prob_map, mines, store, k, p_uncon)
         else:
             print("warning")
             r, c = random_guess(game)
-
-        newly = game.probe(r, c) or set()
-        for (i, j) in newly:
-            add_constraint_for_cell(i, j)
-        if files:
-            num_guesses += 1
\ No newline at end of file
+        if rec:
+            rec.kind = "guess"
+            rec.guess = (r, c)
+            rec.guess_prob = prob_map.get(index_to_var[(r, c)], p_uncon)
+            rec.lap("guess")
+
+        store.reveal(game.probe(r, c))
+        if moves is not None:
+            moves.append((PROBE, GUESSED, r, c))
+        if rec:
+            rec.lap("apply")
+            stats.end_turn(rec)
+        num_guesses += 1
\ No newline at end of file
@@ -0,0 +1,96 @@
+from time import perf_counter
+
+
+class TurnRecord:
+    """
+    What happened in one turn of solve_bt.
+
+    - game, turn: number of the game within the SolverStats and of the turn within the game
+    - kind: "deduction" (settled by deduce), "forced" (settled by counting
+      the components) or "guess"
+    - phases: seconds per phase, timed with perf_counter
+    - constraints: number of constraints on the frontier
+    - components: size of every component that was counted
+    - nodes: nodes explored per component, 0 when the count came from the cache
+    - approximate: components that ran out of budget and were estimated
+    - sampled: components above solve_bt's sample_above that were sampled
+    - guess, guess_prob: the cell probed on a guess turn and its mine probability
+    """
+
+    def __init__(self, game, turn):
+        self.game = game
+        self.turn = turn
+        self.kind = None
+        self.phases = {}
+        self.constraints = 0
+        self.components = []
+        self.nodes = []
+        self.approximate = 0
+        self.sampled = 0
+        self.guess = None
+        self.guess_prob = None
+        self._last = perf_counter()
+
+    def lap(self, phase):
+        """Charge the time since the previous lap to phase."""
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def as_dict(self):
+        return {"game": self.game, "turn": self.turn, "kind": self.kind, "phases": dict(self.phases),
+                "constraints": self.constraints, "components": list(self.components),
+                "nodes": list(self.nodes), "approximate": self.approximate,
+                "sampled": self.sampled, "guess": self.guess, "guess_prob": self.guess_prob}
+
+
+class SolverStats:
+    """
+    Observer passed to solve_bt(stats=...). solve_bt asks it for a
+    TurnRecord at the start of every turn and hands the record back through
+    end_turn once the turn's moves are made, and calls end_game with the
+    result once the game is over. This class keeps every record and the
+    result of every game; subclass it and override end_turn to stream or
+    aggregate instead.
+
+    Without a stats object solve_bt does not read the clock at all.
+    """
+
+    def __init__(self):
+        self.turns = []
+        self.games = 0
+        self.wins = 0
+        self._turn = 0
+
+    def start_game(self, game):
+        self.games += 1
+        self._turn = 0
+
+    def start_turn(self):
+        self._turn += 1
+        return TurnRecord(self.games, self._turn)
+
+    def end_turn(self, record):
+        self.turns.append(record)
+
+    def end_game(self, won):
+        self.wins += won
+
+    def phase_totals(self):
+        totals = {}
+        for record in self.turns:
+            for phase, seconds in record.phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def summary(self):
+        kinds = {}
+        for record in self.turns:
+            kinds[record.kind] = kinds.get(record.kind, 0) + 1
+        return {"games": self.games, "wins": self.wins, "turns": len(self.turns), "kinds": kinds,
+                "phases": self.phase_totals(),
+                "nodes": sum(sum(record.nodes) for record in self.turns),
+                "approximate": sum(record.approximate for record in self.turns),
+                "sampled": sum(record.sampled for record in self.turns),
+                "largest_component": max((max(record.components, default=0) for record in self.turns),
+                                         default=0)}
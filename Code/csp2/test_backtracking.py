@@ -0,0 +1,29 @@
+import sys
+
+from csp_modelling import Variable, CSP
+from constraints import MSConstraint
+from backtracking import bt_count
+
+
+def chain(n):
+    '''Every window of three consecutive cells of a row of n holds one mine.'''
+    variables = [Variable(str(i), [0, 1]) for i in range(n)]
+    constraints = [MSConstraint(f"w{i}", variables[i:i + 3], 1) for i in range(n - 2)]
+    return CSP("chain", variables, constraints)
+
+
+def test_bt_count_chain_deeper_than_recursion_limit():
+    # A low limit keeps the chain, and the test, short
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(250)
+    try:
+        n = sys.getrecursionlimit() + 50
+        for algo in ('BT', 'FC', 'GAC', 'BIT'):
+            csp = chain(n)
+            totals, counts = bt_count(algo, csp, 'fixed')
+            # The mines repeat every three cells, starting at cell 0, 1 or 2
+            assert sum(totals) == 3, algo
+            for v in csp.variables():
+                assert sum(counts[v]) == 1, (algo, v.name())
+    finally:
+        sys.setrecursionlimit(limit)
@@ -1,4 +1,73 @@
+import copy
 import random
+from array import array
+from collections import deque
+from functools import lru_cache
+
+
+class NeighbourTable:
+    """
+    The neighbours of every cell of a rows x cols board, in CSR form and
+    keyed by flat index r * cols + c: the neighbours of cell i are
+    indices[indptr[i]:indptr[i + 1]]. Use neighbour_table() to get the
+    table of a shape, which is built once and shared.
+
+    The table is built with NumPy when it is installed. The list-based game
+    does not otherwise need NumPy, so without it the table is built cell by
+    cell, which is only quick enough for boards of usual size.
+    """
+
+    __slots__ = ("rows", "cols", "indptr", "indices")
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        try:
+            import numpy as np
+        except ImportError:
+            self._build_slow()
+            return
+        cells = np.pad(np.arange(rows * cols, dtype=np.int32).reshape(rows, cols), 1, constant_values=-1)
+        neighbours = np.stack([cells[dr:dr + rows, dc:dc + cols].ravel()
+                               for dr in (0, 1, 2) for dc in (0, 1, 2) if (dr, dc) != (1, 1)], axis=1)
+        valid = neighbours >= 0
+        indptr = np.zeros(rows * cols + 1, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1), out=indptr[1:])
+        self.indptr = array("i", indptr.tobytes())
+        self.indices = array("i", neighbours[valid].tobytes())
+
+    def _build_slow(self):
+        rows, cols = self.rows, self.cols
+        self.indptr = indptr = array("i", [0])
+        self.indices = indices = array("i")
+        for r in range(rows):
+            rs = range(max(r - 1, 0), min(r + 2, rows))
+            for c in range(cols):
+                indices.extend(rr * cols + cc for rr in rs
+                               for cc in range(max(c - 1, 0), min(c + 2, cols)) if (rr, cc) != (r, c))
+                indptr.append(len(indices))
+
+    def of(self, i):
+        """Flat indices of the neighbours of flat cell i."""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def cells(self, r, c):
+        """(row, col) of the neighbours of cell (r, c)."""
+        cols = self.cols
+        return [divmod(j, cols) for j in self.of(r * cols + c)]
+
+
+@lru_cache(maxsize=16)
+def neighbour_table(rows, cols):
+    return NeighbourTable(rows, cols)
+
+
+# Kinds of journal entries, each stored as (kind, r, c)
+REVEAL = 0       # a safe cell was revealed
+REVEAL_MINE = 1  # a mine was revealed when the game was lost
+TOGGLE_FLAG = 2  # the flag of a cell was toggled
+LOST = 3         # the game was lost by probing (r, c)
+
 
 class Minesweeper:
     HIDDEN = '■'
@@ -13,10 +82,25 @@ class Minesweeper:
         self.board = None
         self.first_move = True
 
-        self.revealed = [[False]*cols for _ in range(rows)]
-        self.flagged = [[False]*cols for _ in range(rows)]
+        self._alloc_state()
         self.game_over = False
 
+        # Running counters, kept up to date by probe/flood_fill/toggle_flag
+        self.hidden_cells = rows * cols
+        self.safe_hidden = rows * cols - mines
+        self.flags_placed = 0
+
+        # Every change to revealed, flagged and game_over, in order; see
+        # snapshot() and undo()
+        self.journal = []
+        # Rows of revealed/flagged still shared with a fork(), None if none are
+        self._shared = None
+
+    def _alloc_state(self):
+        # revealed and flagged; engines that store them differently override this
+        self.revealed = [[False]*self.cols for _ in range(self.rows)]
+        self.flagged = [[False]*self.cols for _ in range(self.rows)]
+
     def _generate_board(self, excluded_r, excluded_c):
         all_positions = [
             (r, c)
@@ -25,51 +109,100 @@ class Minesweeper:
             if not (r == excluded_r and c == excluded_c)
         ]
         mines_positions = random.sample(all_positions, self.total_mines)
-
-        # Initialize empty board
-        self.board = [[0]*self.cols for _ in range(self.rows)]
-        for r, c in mines_positions:
-            self.board[r][c] = self.MINE
-
-        # Compute neighbour mine counts
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.board[r][c] == self.MINE:
-                    continue
-                count = 0
-                for dr in (-1, 0, 1):
-                    for dc in (-1, 0, 1):
-                        rr, cc = r+dr, c+dc
-                        if (
-                            0 <= rr < self.rows
-                            and 0 <= cc < self.cols
-                            and self.board[rr][cc] == self.MINE
-                        ):
-                            count += 1
-                self.board[r][c] = count
+        self._place_mines([r * self.cols + c for r, c in mines_positions])
+
+    @classmethod
+    def from_mines(cls, mines):
+        """A game on a fixed board; mines[r][c] is True where a mine is."""
+        rows, cols = len(mines), len(mines[0])
+        game = cls(rows, cols, int(sum(sum(row) for row in mines)))
+        game._set_mines(mines)
+        game.first_move = False
+        return game
+
+    @classmethod
+    def from_packed(cls, rows, cols, packed, mines):
+        """
+        A game on a fixed board given as a little-endian bitmap with bit
+        r * cols + c set for a mine, as stored by board_corpus.
+        """
+        game = cls(rows, cols, mines)
+        game._set_packed(packed)
+        game.first_move = False
+        return game
+
+    def mine_mask(self):
+        return [[cell == self.MINE for cell in row] for row in self.board]
+
+    def _set_mines(self, mines):
+        cols = self.cols
+        self._place_mines([r * cols + c for r in range(self.rows) for c in range(cols) if mines[r][c]])
+
+    def _set_packed(self, packed):
+        bits = int.from_bytes(packed, "little")
+        positions = []
+        while bits:
+            low = bits & -bits
+            positions.append(low.bit_length() - 1)
+            bits ^= low
+        self._place_mines(positions)
+
+    def _place_mines(self, positions):
+        # Every mine, given by its flat index, adds one to the count of each
+        # of its neighbours
+        cols = self.cols
+        table = neighbour_table(self.rows, cols)
+        counts = [0] * (self.rows * cols)
+        for i in positions:
+            for j in table.of(i):
+                counts[j] += 1
+        for i in positions:
+            counts[i] = self.MINE
+        self.board = [counts[r * cols:(r + 1) * cols] for r in range(self.rows)]
 
     def flood_fill(self, r, c):
-        stack = [(r, c)]
-        revealed = {(r, c)}
-        while stack:
-            r, c = stack.pop()
-            if self.revealed[r][c]:
-                continue
-            self.revealed[r][c] = True
+        # Breadth-first over flat indices; seen keeps every cell from being
+        # queued more than once and only grows with the area revealed
+        cols = self.cols
+        table = neighbour_table(self.rows, cols)
+        indptr, indices = table.indptr, table.indices
+        start = r * cols + c
+        seen = {start}
+        queue = deque([start])
+        newly = set()
+        while queue:
+            i = queue.popleft()
+            r, c = divmod(i, cols)
+            self._reveal_safe(r, c)
+            newly.add((r, c))
             if self.board[r][c] == 0:
-                for dr in (-1, 0, 1):
-                    for dc in (-1, 0, 1):
-                        rr, cc = r+dr, c+dc
-                        if (
-                            0 <= rr < self.rows
-                            and 0 <= cc < self.cols
-                            and not self.revealed[rr][cc]
-                        ):
-                            revealed.add((rr, cc))
-                            stack.append((rr, cc))
+                for j in indices[indptr[i]:indptr[i + 1]]:
+                    if j not in seen:
+                        seen.add(j)
+                        rr, cc = divmod(j, cols)
+                        if not self.revealed[rr][cc]:
+                            queue.append(j)
 
-        return revealed
+        return newly
 
+    def _own(self, r):
+        """Copy row r of revealed and flagged if it is still shared with a fork."""
+        if self._shared and r in self._shared:
+            self._shared.discard(r)
+            self.revealed[r] = self.revealed[r][:]
+            self.flagged[r] = self.flagged[r][:]
+
+    def _reveal_safe(self, r, c):
+        self._own(r)
+        if self.flagged[r][c]:
+            # A wrong flag uncovered by a flood fill
+            self.flagged[r][c] = False
+            self.flags_placed -= 1
+            self.journal.append((TOGGLE_FLAG, r, c))
+        self.revealed[r][c] = True
+        self.hidden_cells -= 1
+        self.safe_hidden -= 1
+        self.journal.append((REVEAL, r, c))
 
     def probe(self, r, c):
         if self.first_move:
@@ -83,17 +216,21 @@ class Minesweeper:
 
         if self.board[r][c] == self.MINE:
             self.game_over = True
+            self.journal.append((LOST, r, c))
             for i in range(self.rows):
                 for j in range(self.cols):
                     if self.board[i][j] == self.MINE and not self.revealed[i][j]:
+                        self._own(i)
                         self.revealed[i][j] = True
+                        self.journal.append((REVEAL_MINE, i, j))
                         newly.add((i, j))
+            self.hidden_cells -= len(newly)
 
         elif self.board[r][c] == 0:
             newly = self.flood_fill(r, c)
 
         else:
-            self.revealed[r][c] = True
+            self._reveal_safe(r, c)
             newly.add((r, c))
 
         return newly
@@ -106,26 +243,65 @@ class Minesweeper:
 
     def toggle_flag(self, r, c):
         if not self.revealed[r][c]:
+            self._own(r)
             self.flagged[r][c] = not self.flagged[r][c]
+            self.flags_placed += 1 if self.flagged[r][c] else -1
+            self.journal.append((TOGGLE_FLAG, r, c))
+
+    def snapshot(self):
+        """A mark of the current state to undo() back to later."""
+        return len(self.journal)
+
+    def undo(self, snapshot):
+        """
+        Roll revealed, flagged, game_over and the counters back to what they
+        were at snapshot, which must come from this game. The board itself
+        is never rolled back, so a snapshot taken before the first probe
+        keeps the mines that probe placed.
+        """
+        journal = self.journal
+        while len(journal) > snapshot:
+            kind, r, c = journal.pop()
+            if kind == LOST:
+                self.game_over = False
+                continue
+            self._own(r)
+            if kind == TOGGLE_FLAG:
+                self.flagged[r][c] = not self.flagged[r][c]
+                self.flags_placed += 1 if self.flagged[r][c] else -1
+            else:
+                self.revealed[r][c] = False
+                self.hidden_cells += 1
+                if kind == REVEAL:
+                    self.safe_hidden += 1
+
+    def fork(self):
+        """
+        An independent copy of the game. The board is shared, and so are the
+        rows of revealed and flagged until either game changes one of them
+        (copy-on-write), so forking costs O(rows) instead of a deep copy.
+        The fork starts with an empty journal.
+        """
+        other = copy.copy(self)
+        other.revealed = self.revealed[:]
+        other.flagged = self.flagged[:]
+        other.journal = []
+        self._shared = set(range(self.rows))
+        other._shared = set(range(self.rows))
+        return other
 
     def check_win(self):
-        if self.board is None:
-            return False
-
         # Win if all non-mine cells are revealed
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.board[r][c] != self.MINE and not self.revealed[r][c]:
-                    return False
-        return True
+        return self.board is not None and self.safe_hidden == 0
+
+    def mines_remaining(self):
+        return self.total_mines - self.flags_placed
+
+    def hidden_unflagged(self):
+        return self.hidden_cells - self.flags_placed
 
     def get_board_str(self) -> str:
-        flags_placed = sum(
-            self.flagged[r][c]
-            for r in range(self.rows)
-            for c in range(self.cols)
-        )
-        lines = [f"Mines remaining: {self.total_mines - flags_placed}"]
+        lines = [f"Mines remaining: {self.mines_remaining()}"]
 
         header = "    " + "".join(f"{c:>3}" for c in range(self.cols))
         lines.append(header)
@@ -181,8 +357,9 @@ def play():
     print("2) Intermediate (16×16, 40 mines)")
     print("3) Expert       (16×30, 99 mines)")
     print("4) Custom")
+    print("5) Huge         (only the explored area is kept in memory)")
 
-    choice = input("Enter choice [1-4]: ").strip()
+    choice = input("Enter choice [1-5]: ").strip()
     while True:
         if choice == "1":
             rows, cols, mines = 9, 9, 10
@@ -193,7 +370,7 @@ def play():
         elif choice == "3":
             rows, cols, mines = 16, 30, 99
             break
-        elif choice == "4":
+        elif choice in ("4", "5"):
             rows = int(input("Rows: ").strip())
             cols = int(input("Cols: ").strip())
             max_mines = rows * cols - 1
@@ -206,7 +383,11 @@ def play():
         else:
             print("Invalid choice :<")
 
-    game = Minesweeper(rows, cols, mines)
+    if choice == "5":
+        from Code.sparse_minesweeper import SparseMinesweeper
+        game = SparseMinesweeper(rows, cols, mines)
+    else:
+        game = Minesweeper(rows, cols, mines)
 
     while True:
         game.print_board()              # ← updated
@@ -0,0 +1,363 @@
+import copy
+import random
+
+import numpy as np
+
+from Code.minesweeper import Minesweeper, REVEAL, REVEAL_MINE, TOGGLE_FLAG, LOST
+
+CHUNK = 64        # chunks are CHUNK x CHUNK cells
+MINE_CODE = 9     # value of a mine in a chunk's counts
+
+
+class _Chunk:
+    """Cell state of one chunk; cell (r, c) is at (r % CHUNK) * CHUNK + c % CHUNK."""
+
+    __slots__ = ("counts", "revealed", "flagged")
+
+    def __init__(self, counts):
+        self.counts = counts  # neighbour count of every cell, MINE_CODE for mines
+        self.revealed = bytearray(CHUNK * CHUNK)
+        self.flagged = bytearray(CHUNK * CHUNK)
+
+    def copy(self):
+        other = _Chunk.__new__(_Chunk)
+        other.counts = self.counts  # never written after the chunk is made
+        other.revealed = self.revealed[:]
+        other.flagged = self.flagged[:]
+        return other
+
+
+class _Rows:
+    """Read-only game.revealed[r][c] style access to a SparseMinesweeper."""
+
+    __slots__ = ("_get",)
+
+    def __init__(self, get):
+        self._get = get
+
+    def __getitem__(self, r):
+        return _Row(self._get, r)
+
+
+class _Row:
+    __slots__ = ("_get", "_r")
+
+    def __init__(self, get, r):
+        self._get = get
+        self._r = r
+
+    def __getitem__(self, c):
+        return self._get(self._r, c)
+
+
+class SparseMinesweeper(Minesweeper):
+    """
+    Minesweeper for huge boards (1000x1000 and up), where memory grows
+    with the explored area instead of the board area.
+
+    The board is split into CHUNK x CHUNK chunks. When the board is
+    generated only the number of mines of every chunk is drawn, with one
+    multivariate hypergeometric sample. The mines of a chunk are placed
+    the first time they are needed, from a generator seeded by the board
+    seed and the chunk, so they do not depend on the order chunks are
+    visited in. A chunk's counts, revealed and flagged cells are
+    materialised the first time one of its cells is revealed, flagged or
+    asked for its number; a chunk that was never touched reads as
+    covered and unflagged. Flags placed before the first probe are kept
+    aside until the board is drawn.
+
+    probe, toggle_flag, get_cell_number, the counters and the journal behave
+    like in Minesweeper, except that losing only reveals the mine that was
+    hit. fork shares the mine layouts and, copy-on-write, the cell state of
+    every chunk materialised so far. game.revealed[r][c], game.flagged[r][c] and game.board[r][c] are
+    read-only views. get_board_str shows a window around the last probe.
+    """
+
+    sparse = True
+
+    def __init__(self, rows=9, cols=9, mines=10):
+        self.rows = rows
+        self.cols = cols
+        self.total_mines = mines
+
+        self.board = None
+        self.first_move = True
+        self.game_over = False
+        self.revealed = _Rows(self._is_revealed)
+        self.flagged = _Rows(self._is_flagged)
+
+        self.hidden_cells = rows * cols
+        self.safe_hidden = rows * cols - mines
+        self.flags_placed = 0
+
+        self.chunk_rows = -(-rows // CHUNK)
+        self.chunk_cols = -(-cols // CHUNK)
+        self._seed = None
+        self._excluded = None
+        self._chunk_mines = None  # number of mines of every chunk, flat
+        self._mines = {}          # (chunk row, chunk col) -> bytearray, 1 where a mine is
+        self._chunks = {}         # (chunk row, chunk col) -> _Chunk
+        self._early_flags = set() # cells flagged before the board was drawn
+        self.view = (0, 0)        # cell get_board_str centres on
+
+        self.journal = []         # as in Minesweeper, see snapshot() and undo()
+        self._shared = None       # chunks whose state is still shared with a fork()
+
+    def _chunk_shape(self, cr, cc):
+        return min(CHUNK, self.rows - cr * CHUNK), min(CHUNK, self.cols - cc * CHUNK)
+
+    def _generate_board(self, excluded_r, excluded_c):
+        # Seeded from the random module, so random.seed() still fixes the board
+        self._seed = random.getrandbits(64)
+        self._excluded = (excluded_r, excluded_c)
+        heights = np.minimum(CHUNK, self.rows - CHUNK * np.arange(self.chunk_rows))
+        widths = np.minimum(CHUNK, self.cols - CHUNK * np.arange(self.chunk_cols))
+        sizes = np.outer(heights, widths).ravel()
+        sizes[(excluded_r // CHUNK) * self.chunk_cols + excluded_c // CHUNK] -= 1
+        rng = np.random.default_rng(self._seed)
+        self._chunk_mines = rng.multivariate_hypergeometric(sizes, self.total_mines)
+        self.board = _Rows(self._board_value)
+
+    def _set_mines(self, mines):
+        mines = np.asarray(mines, dtype=bool)
+        self._mines = {}
+        self._chunks = {}
+        for cr in range(self.chunk_rows):
+            for cc in range(self.chunk_cols):
+                block = np.zeros((CHUNK, CHUNK), dtype=np.uint8)
+                h, w = self._chunk_shape(cr, cc)
+                block[:h, :w] = mines[cr * CHUNK:cr * CHUNK + h, cc * CHUNK:cc * CHUNK + w]
+                self._mines[(cr, cc)] = bytearray(block.tobytes())
+        self.board = _Rows(self._board_value)
+
+    def _set_packed(self, packed):
+        bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=self.rows * self.cols,
+                             bitorder="little")
+        self._set_mines(bits.reshape(self.rows, self.cols))
+
+    def _mines_of(self, cr, cc):
+        """Mine layout of a chunk, placed on first use."""
+        key = (cr, cc)
+        mines = self._mines.get(key)
+        if mines is None:
+            mines = bytearray(CHUNK * CHUNK)
+            k = int(self._chunk_mines[cr * self.chunk_cols + cc])
+            if k:
+                h, w = self._chunk_shape(cr, cc)
+                cells = np.arange(h * w)
+                er, ec = self._excluded
+                if er // CHUNK == cr and ec // CHUNK == cc:
+                    cells = np.delete(cells, (er % CHUNK) * w + ec % CHUNK)
+                rng = np.random.default_rng([self._seed, cr, cc])
+                for i in rng.choice(cells, k, replace=False):
+                    mines[(i // w) * CHUNK + i % w] = 1
+            self._mines[key] = mines
+        return mines
+
+    def _chunk(self, cr, cc):
+        """State of a chunk, materialised on first use."""
+        chunk = self._chunks.get((cr, cc))
+        if chunk is None:
+            # Neighbour counts need the mines of the surrounding chunks too
+            area = np.zeros((3 * CHUNK, 3 * CHUNK), dtype=np.uint8)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    r, c = cr + dr, cc + dc
+                    if 0 <= r < self.chunk_rows and 0 <= c < self.chunk_cols:
+                        area[(dr + 1) * CHUNK:(dr + 2) * CHUNK, (dc + 1) * CHUNK:(dc + 2) * CHUNK] = \
+                            np.frombuffer(self._mines_of(r, c), dtype=np.uint8).reshape(CHUNK, CHUNK)
+            padded = area[CHUNK - 1:2 * CHUNK + 1, CHUNK - 1:2 * CHUNK + 1]
+            counts = np.zeros((CHUNK, CHUNK), dtype=np.uint8)
+            for dr in (0, 1, 2):
+                for dc in (0, 1, 2):
+                    if dr == 1 and dc == 1:
+                        continue
+                    counts += padded[dr:dr + CHUNK, dc:dc + CHUNK]
+            counts[padded[1:-1, 1:-1] == 1] = MINE_CODE
+            chunk = self._chunks[(cr, cc)] = _Chunk(bytearray(counts.tobytes()))
+        return chunk
+
+    def _cell(self, r, c):
+        return self._chunk(r // CHUNK, c // CHUNK), (r % CHUNK) * CHUNK + c % CHUNK
+
+    def _own(self, r, c):
+        """_cell, first copying the chunk's state if it is still shared with a fork."""
+        key = (r // CHUNK, c // CHUNK)
+        if self._shared and key in self._shared:
+            self._shared.discard(key)
+            self._chunks[key] = self._chunks[key].copy()
+        return self._cell(r, c)
+
+    def _is_revealed(self, r, c):
+        chunk = self._chunks.get((r // CHUNK, c // CHUNK))
+        return chunk is not None and chunk.revealed[(r % CHUNK) * CHUNK + c % CHUNK] == 1
+
+    def _is_flagged(self, r, c):
+        if self.board is None:
+            return (r, c) in self._early_flags
+        chunk = self._chunks.get((r // CHUNK, c // CHUNK))
+        return chunk is not None and chunk.flagged[(r % CHUNK) * CHUNK + c % CHUNK] == 1
+
+    def _board_value(self, r, c):
+        chunk, i = self._cell(r, c)
+        n = chunk.counts[i]
+        return self.MINE if n == MINE_CODE else n
+
+    def chunks_materialised(self):
+        return len(self._chunks)
+
+    def mine_mask(self):
+        """Dense mine mask; places the mines of every chunk, so only for boards of usual size."""
+        mask = []
+        for r in range(self.rows):
+            row = []
+            for c in range(self.cols):
+                row.append(self._mines_of(r // CHUNK, c // CHUNK)[(r % CHUNK) * CHUNK + c % CHUNK] == 1)
+            mask.append(row)
+        return mask
+
+    def flood_fill(self, r, c):
+        stack = [(r, c)]
+        newly = set()
+        rows, cols = self.rows, self.cols
+        while stack:
+            r, c = stack.pop()
+            chunk, i = self._cell(r, c)
+            if chunk.revealed[i]:
+                continue
+            self._reveal_safe(r, c)
+            newly.add((r, c))
+            if chunk.counts[i] == 0:
+                for rr in range(max(r - 1, 0), min(r + 2, rows)):
+                    for cc in range(max(c - 1, 0), min(c + 2, cols)):
+                        if not self._is_revealed(rr, cc):
+                            stack.append((rr, cc))
+        return newly
+
+    def _reveal_safe(self, r, c):
+        chunk, i = self._own(r, c)
+        if chunk.flagged[i]:
+            # A wrong flag uncovered by a flood fill
+            chunk.flagged[i] = 0
+            self.flags_placed -= 1
+            self.journal.append((TOGGLE_FLAG, r, c))
+        chunk.revealed[i] = 1
+        self.hidden_cells -= 1
+        self.safe_hidden -= 1
+        self.journal.append((REVEAL, r, c))
+
+    def probe(self, r, c):
+        if self.first_move:
+            self._generate_board(r, c)
+            self.first_move = False
+            # Flags placed so far move into the chunks, which now have mines
+            for fr, fc in self._early_flags:
+                chunk, i = self._cell(fr, fc)
+                chunk.flagged[i] = 1
+            self._early_flags = set()
+
+        self.view = (r, c)
+        chunk, i = self._cell(r, c)
+        if chunk.flagged[i] or chunk.revealed[i]:
+            return set()
+
+        if chunk.counts[i] == MINE_CODE:
+            self.game_over = True
+            self.journal.append((LOST, r, c))
+            chunk, i = self._own(r, c)
+            chunk.revealed[i] = 1
+            self.hidden_cells -= 1
+            self.journal.append((REVEAL_MINE, r, c))
+            return {(r, c)}
+
+        if chunk.counts[i] == 0:
+            return self.flood_fill(r, c)
+
+        self._reveal_safe(r, c)
+        return {(r, c)}
+
+    def undo(self, snapshot):
+        journal = self.journal
+        while len(journal) > snapshot:
+            kind, r, c = journal.pop()
+            if kind == LOST:
+                self.game_over = False
+                continue
+            if self.board is None:
+                self._early_flags ^= {(r, c)}
+                self.flags_placed += 1 if (r, c) in self._early_flags else -1
+                continue
+            chunk, i = self._own(r, c)
+            if kind == TOGGLE_FLAG:
+                chunk.flagged[i] ^= 1
+                self.flags_placed += 1 if chunk.flagged[i] else -1
+            else:
+                chunk.revealed[i] = 0
+                self.hidden_cells += 1
+                if kind == REVEAL:
+                    self.safe_hidden += 1
+
+    def fork(self):
+        """
+        An independent copy of the game. The mine layouts are shared, since
+        they never change once placed, and so is the state of every chunk
+        until either game writes to it. Chunks materialised after the fork
+        belong to one game only. The fork starts with an empty journal.
+        """
+        other = copy.copy(self)
+        other.revealed = _Rows(other._is_revealed)
+        other.flagged = _Rows(other._is_flagged)
+        if self.board is not None:
+            other.board = _Rows(other._board_value)
+        else:
+            # Each game will draw its own board on its first probe
+            other._mines = {}
+        other._chunks = dict(self._chunks)
+        other._early_flags = set(self._early_flags)
+        other.journal = []
+        self._shared = set(self._chunks)
+        other._shared = set(self._chunks)
+        return other
+
+    def get_cell_number(self, r, c):
+        if not self._is_revealed(r, c):
+            return None
+        chunk, i = self._cell(r, c)
+        n = chunk.counts[i]
+        return self.MINE if n == MINE_CODE else n
+
+    def toggle_flag(self, r, c):
+        if self.board is None:
+            # No mines to build chunks from yet, and nothing is revealed
+            self._early_flags ^= {(r, c)}
+            self.flags_placed += 1 if (r, c) in self._early_flags else -1
+            self.journal.append((TOGGLE_FLAG, r, c))
+            return
+        chunk, i = self._own(r, c)
+        if not chunk.revealed[i]:
+            chunk.flagged[i] ^= 1
+            self.flags_placed += 1 if chunk.flagged[i] else -1
+            self.journal.append((TOGGLE_FLAG, r, c))
+
+    def get_board_str(self, height=30, width=40) -> str:
+        top = min(max(self.view[0] - height // 2, 0), max(self.rows - height, 0))
+        left = min(max(self.view[1] - width // 2, 0), max(self.cols - width, 0))
+        bottom, right = min(top + height, self.rows), min(left + width, self.cols)
+
+        lines = [f"Mines remaining: {self.mines_remaining()}  "
+                 f"(rows {top}-{bottom - 1}, cols {left}-{right - 1} of {self.rows}x{self.cols})"]
+        lines.append("      " + "".join(f"{c % 1000:>4}" for c in range(left, right)))
+        lines.append("      " + "—" * (4 * (right - left + 1)))
+        for r in range(top, bottom):
+            row_cells = []
+            for c in range(left, right):
+                if self._is_revealed(r, c):
+                    ch = str(self.get_cell_number(r, c))
+                elif self._is_flagged(r, c):
+                    ch = self.FLAG
+                else:
+                    ch = self.HIDDEN
+                row_cells.append(f"   {ch}")
+            lines.append(f"{r:>4} |" + "".join(row_cells))
+
+        return "\n".join(lines)
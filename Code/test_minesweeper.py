@@ -0,0 +1,75 @@
+from Code.minesweeper import Minesweeper
+from Code.sparse_minesweeper import SparseMinesweeper
+
+ENGINES = (Minesweeper, SparseMinesweeper)
+
+
+def board():
+    '''A 6x6 board with mines down the right edge and in the bottom corner.'''
+    mines = [[False] * 6 for _ in range(6)]
+    for r, c in ((0, 5), (1, 5), (2, 5), (5, 0)):
+        mines[r][c] = True
+    return mines
+
+
+def state(game):
+    '''Everything undo() has to roll back.'''
+    cells = [(r, c) for r in range(game.rows) for c in range(game.cols)]
+    return ([game.revealed[r][c] for r, c in cells], [game.flagged[r][c] for r, c in cells],
+            game.hidden_cells, game.safe_hidden, game.flags_placed, game.game_over)
+
+
+def test_undo_flood_fill():
+    for cls in ENGINES:
+        game = cls.from_mines(board())
+        game.toggle_flag(5, 0)
+        # A wrong flag the flood fill uncovers
+        game.toggle_flag(0, 0)
+        before = state(game)
+        snapshot = game.snapshot()
+        assert len(game.probe(2, 2)) > 1, cls.__name__
+        assert not game.flagged[0][0], cls.__name__
+        game.undo(snapshot)
+        assert state(game) == before, cls.__name__
+        assert game.flagged[0][0] and game.flagged[5][0], cls.__name__
+
+
+def test_undo_loss():
+    for cls in ENGINES:
+        game = cls.from_mines(board())
+        game.probe(5, 5)
+        before = state(game)
+        snapshot = game.snapshot()
+        game.probe(0, 5)
+        assert game.game_over, cls.__name__
+        game.undo(snapshot)
+        assert state(game) == before, cls.__name__
+        assert not game.game_over and not game.revealed[0][5], cls.__name__
+
+
+def test_undo_flag_before_first_probe():
+    for cls in ENGINES:
+        game = cls(100, 100, 500)
+        before = state(game)
+        game.toggle_flag(70, 70)
+        assert game.flagged[70][70] and game.flags_placed == 1, cls.__name__
+        game.undo(0)
+        assert state(game) == before, cls.__name__
+
+
+def test_fork_leaves_parent_unchanged():
+    for cls in ENGINES:
+        game = cls.from_mines(board())
+        game.probe(5, 5)
+        before = state(game)
+        other = game.fork()
+        other.probe(2, 2)
+        other.toggle_flag(5, 0)
+        other.probe(0, 5)
+        assert state(game) == before, cls.__name__
+        assert state(other) != before, cls.__name__
+        # And the other way round
+        forked = state(other)
+        game.toggle_flag(1, 5)
+        game.probe(0, 0)
+        assert state(other) == forked, cls.__name__